@@ -4,25 +4,137 @@ Developer: zerosocialcode
 A modern web app for generating beautifully themed PDFs from text input
 """
 
-from flask import Flask, render_template, request, send_file, jsonify
-from utils.parser import parse_text
-from utils.pdf_generator import generate_pdf
+import time
+
+# Startup time is reported from here, once the interpreter is up
+STARTED = time.perf_counter()
+
+from flask import Flask, Response, render_template, request, send_file, jsonify
+from utils.parser import iter_blocks, iter_lines, parse_text
+from utils.pdf_generator import (
+    ALIGNMENT_MAP, generate_pdf, generate_pdf_stream, generate_preview, prepare_block_images
+)
+from utils.render_cache import RenderCache, render_key
+from utils.storage import create_storage, valid_name
+from utils.jobs import (
+    JobQueue, render_comparison, render_document, render_merge, render_merge_combined, render_parsed
+)
+from utils.merge import block_fields, missing_fields, read_records
+from utils.retention import RetentionSweeper
+from utils.image_store import ImageStore
+from utils.batch import iter_zip
+from utils.metrics import metrics, server_timing
+from utils import images as image_prep
+from utils import fonts
+from utils import markup
+from utils.admission import AdmissionController, Rejected
+from utils.estimator import admission_seconds, estimate_render, estimate_size
+from utils.profiles import DEFAULT_PROFILE, PROFILES, get_profile
+from utils.warmup import freeze_heap, warm_up, warm_worker
+import csv
+import hashlib
+import json
 import os
-from datetime import datetime
+import uuid
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import wrap_file
 
 app = Flask(__name__)
 
 # Configuration
 app.config['SECRET_KEY'] = 'velvetdocs-secret-key-2024'
-app.config['UPLOAD_FOLDER'] = 'generated_pdfs'
+app.config['STORAGE_BACKEND'] = os.environ.get('VELVETDOCS_STORAGE', 'local')  # local, memory or sqlite
+app.config['STORAGE_PATH'] = os.environ.get(  # folder for local, database file for sqlite
+    'VELVETDOCS_STORAGE_PATH',
+    'generated_pdfs/pdfs.sqlite3' if app.config['STORAGE_BACKEND'] == 'sqlite' else 'generated_pdfs')
+app.config['SCRATCH_FOLDER'] = 'render_scratch'  # renders are written here, then moved into storage
 app.config['IMAGE_FOLDER'] = 'uploaded_images'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
+app.config['DOCUMENT_FOLDER'] = 'uploaded_documents'
+app.config['PREPARED_IMAGE_FOLDER'] = 'prepared_images'
+app.config['FONT_FOLDER'] = os.environ.get('VELVETDOCS_FONT_FOLDER', 'fonts')  # TTF families, <Family>-<Face>.ttf
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024  # 64MB max (large text documents)
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+app.config['DOCUMENT_EXTENSIONS'] = {'txt', 'md', 'markdown'}
+app.config['OUTPUT_PROFILE'] = DEFAULT_PROFILE  # draft, web, standard, print or grayscale unless the request picks one
+app.config['IMAGE_DPI_CHOICES'] = {72, 150, 300}  # allowed values for the image_dpi field (default: the profile's)
+app.config['RENDER_CACHE_MAX_BYTES'] = 256 * 1024 * 1024  # 256MB of cached PDFs
+app.config['STREAM_SPOOL_MAX_BYTES'] = 8 * 1024 * 1024  # streamed renders above this spill to a temp file
+app.config['BATCH_MAX_DOCUMENTS'] = 500  # documents accepted by /generate/batch
+app.config['MERGE_MAX_RECORDS'] = 10000  # records accepted by /generate/merge
+app.config['MERGE_CHUNK_RECORDS'] = 25  # records per worker task when merging to one PDF per record
+app.config['COMPARE_MAX_PAGES'] = 5  # pages per theme on a /generate/themes comparison sheet
+app.config['PREVIEW_PAGES'] = 2  # pages rendered for preview=1 unless preview_pages is given
+app.config['PREVIEW_MAX_PAGES'] = 10  # largest preview_pages accepted
+app.config['PREVIEW_TIME_BUDGET'] = 1.0  # seconds of layout before a preview is cut short
+app.config['RETENTION_TTL'] = 3600  # remove files unused for an hour
+app.config['DISK_BUDGET_BYTES'] = 1024 * 1024 * 1024  # 1GB across uploads and prepared images (PDFs: RENDER_CACHE_MAX_BYTES)
+app.config['SWEEP_INTERVAL'] = 30  # seconds between retention sweeps
+app.config['RENDER_WORKERS'] = int(os.environ.get('VELVETDOCS_RENDER_WORKERS', os.cpu_count() or 1))  # 0 disables job mode
+app.config['METRICS_ENABLED'] = os.environ.get('VELVETDOCS_METRICS', '1') != '0'  # stage timers and /metrics
+app.config['RENDER_IN_POOL'] = os.environ.get('VELVETDOCS_RENDER_IN_POOL') == '1'  # render /generate on the worker pool (asgi.py sets this)
+app.config['REQUEST_THREADS'] = int(os.environ.get('VELVETDOCS_REQUEST_THREADS', 32))  # asgi.py: requests handled at once
+app.config['UPLOAD_SPOOL_MAX_BYTES'] = 1024 * 1024  # asgi.py: request bodies above this are spooled to disk
+app.config['ADMISSION_FAST_COST'] = 0.5  # renders estimated under this many seconds use the fast lane
+app.config['ADMISSION_FAST_SLOTS'] = os.cpu_count() or 1  # fast renders running at once
+app.config['ADMISSION_HEAVY_SLOTS'] = max(1, (os.cpu_count() or 1) // 2)  # heavy renders running at once
+app.config['ADMISSION_FAST_QUEUE'] = 64  # fast renders waiting before 429
+app.config['ADMISSION_HEAVY_QUEUE'] = 16  # heavy renders waiting before 429
+app.config['ADMISSION_CLIENT_LIMIT'] = 4  # renders one client may run before the rest queue behind other clients
+app.config['ADMISSION_MAX_WAIT'] = 30  # seconds a render may wait for a slot before 429
+app.config['ADMISSION_CLIENT_HEADER'] = os.environ.get('VELVETDOCS_CLIENT_HEADER')  # e.g. X-Client-Id; only set it if a trusted proxy does
+app.config['WARMUP'] = os.environ.get('VELVETDOCS_WARMUP', '1') != '0'  # throwaway render of each theme at startup
 
 # Ensure folders exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['SCRATCH_FOLDER'], exist_ok=True)
 os.makedirs(app.config['IMAGE_FOLDER'], exist_ok=True)
+os.makedirs(app.config['DOCUMENT_FOLDER'], exist_ok=True)
+os.makedirs(app.config['PREPARED_IMAGE_FOLDER'], exist_ok=True)
+image_prep.PREPARED_IMAGE_FOLDER = app.config['PREPARED_IMAGE_FOLDER']
+
+# Per-stage timers feed Server-Timing headers and /metrics
+metrics.enabled = app.config['METRICS_ENABLED']
+
+# Register TTF fonts and build every theme's styles once so requests share
+# them read-only, then render each theme once so nothing loads lazily later
+fonts.FONT_FOLDER = app.config['FONT_FOLDER']
+warmup_report = warm_up(None if app.config['WARMUP'] else ())
+
+# Rendered PDFs live in the configured storage backend
+storage = create_storage(app.config['STORAGE_BACKEND'], app.config['STORAGE_PATH'],
+                         app.config['RENDER_CACHE_MAX_BYTES'])
+
+# Rendered PDFs are content-addressed, so identical requests reuse the same file
+render_cache = RenderCache(storage, app.config['RENDER_CACHE_MAX_BYTES'])
+
+# Uploaded images are stored once per distinct content
+image_store = ImageStore(app.config['IMAGE_FOLDER'])
+
+# Old uploads are removed by a background thread, not per request; the
+# render cache expires stored PDFs on the same schedule
+retention = RetentionSweeper(
+    [app.config['IMAGE_FOLDER'], app.config['DOCUMENT_FOLDER'], app.config['PREPARED_IMAGE_FOLDER'],
+     app.config['SCRATCH_FOLDER']],
+    ttl=app.config['RETENTION_TTL'],
+    max_bytes=app.config['DISK_BUDGET_BYTES'],
+    interval=app.config['SWEEP_INTERVAL'],
+    pinned=image_store.is_referenced,
+    stores=[render_cache]
+)
+
+# Background render jobs (POST /generate with mode=job)
+job_queue = JobQueue(app.config['RENDER_WORKERS'], initializer=warm_worker,
+                     initargs=(app.config['FONT_FOLDER'],))
+
+# Cheap renders and expensive ones queue separately, fairly across clients
+admission = AdmissionController(
+    fast_slots=app.config['ADMISSION_FAST_SLOTS'],
+    heavy_slots=app.config['ADMISSION_HEAVY_SLOTS'],
+    fast_queue=app.config['ADMISSION_FAST_QUEUE'],
+    heavy_queue=app.config['ADMISSION_HEAVY_QUEUE'],
+    fast_cost=app.config['ADMISSION_FAST_COST'],
+    client_limit=app.config['ADMISSION_CLIENT_LIMIT'],
+    max_wait=app.config['ADMISSION_MAX_WAIT']
+)
 
 # Available themes
 THEMES = {
@@ -38,6 +150,170 @@ def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def allowed_document(filename):
+    """Check if a text document upload has an allowed extension"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['DOCUMENT_EXTENSIONS']
+
+def save_uploaded_images():
+    """
+    Store the request's image uploads and return their paths
+    
+    Identical images share one stored file. Each path holds an image store
+    reference until it is released; if a save fails, the ones already taken
+    are released before the error is raised
+    """
+    paths = []
+    with metrics.stage('upload'):
+        try:
+            for file in request.files.getlist('images'):
+                if file and file.filename and allowed_file(file.filename):
+                    filepath = image_store.save(file, secure_filename(file.filename))
+                    retention.touch(filepath)
+                    paths.append(filepath)
+        except Exception:
+            image_store.release(paths)
+            raise
+    return paths
+
+def validate_render_options(theme, alignment, profile, image_dpi):
+    """
+    Raise ValueError if a theme, alignment, output profile or image resolution is not allowed
+    
+    Batch documents come from JSON, so types are checked before any lookup
+    """
+    if not isinstance(theme, str) or theme not in THEMES:
+        raise ValueError('Invalid theme selected')
+    if not isinstance(alignment, str) or alignment not in ALIGNMENT_MAP:
+        raise ValueError('Invalid alignment selected')
+    if not isinstance(profile, str) or profile not in PROFILES:
+        raise ValueError('Invalid output profile selected')
+    if type(image_dpi) is not int or image_dpi not in app.config['IMAGE_DPI_CHOICES']:
+        raise ValueError('Invalid image resolution selected')
+
+def scratch_path(filename):
+    """Private local file a render is written to before it goes into storage"""
+    return os.path.join(app.config['SCRATCH_FOLDER'], f'{uuid.uuid4().hex}_{filename}')
+
+def store_render(cache_key, filename, filepath):
+    """Move a freshly written PDF into storage and register it with the render cache"""
+    storage.save(filename, filepath)
+    render_cache.put(cache_key, filename)
+
+def send_stored(filename):
+    """Send a stored PDF as an attachment, or return None if it is not stored"""
+    path = storage.local_path(filename)
+    if path is None:
+        path = storage.open(filename)
+        if path is None:
+            return None
+    return send_file(path, mimetype='application/pdf', as_attachment=True, download_name=filename)
+
+def save_document(cache_key, document):
+    """Save an uploaded document for a worker process to read; returns its path, or None"""
+    if not document:
+        return None
+    text_path = os.path.join(app.config['DOCUMENT_FOLDER'], f'{cache_key}.txt')
+    with metrics.stage('upload'):
+        document.stream.seek(0)
+        document.save(text_path)
+    retention.track(text_path)
+    return text_path
+
+def queue_render(cache_key, filename, text_content, document, uploaded_images, theme, alignment, image_dpi,
+                 profile, cost):
+    """
+    Queue a full render as a job and return its id without waiting for admission
+    
+    The job reserves an admission slot (raising Rejected at once if its lane's
+    queue is full) and is handed to the worker pool when the slot is granted.
+    It releases the images and its slot when it ends
+    """
+    filepath = scratch_path(filename)
+    ticket = admission.reserve(client_id(), cost)
+    
+    def finished():
+        image_store.release(uploaded_images)
+        ticket.release()
+    
+    try:
+        text_path = save_document(cache_key, document)
+        job_id = job_queue.create(filename)
+    except Exception:
+        ticket.release()
+        raise
+    ticket.when_granted(lambda ticket: job_queue.start(
+        job_id, render_document, text_content, uploaded_images, theme, filepath, alignment, text_path, image_dpi,
+        profile, on_success=lambda: store_render(cache_key, filename, filepath), on_finished=finished
+    ))
+    return job_id
+
+def document_size(document):
+    """Size in bytes of an uploaded file, leaving it rewound"""
+    stream = document.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def client_id():
+    """
+    Who a request's renders count against for fair scheduling
+    
+    The client header is only read when ADMISSION_CLIENT_HEADER names one:
+    otherwise any client could pick a new id per request
+    """
+    header = app.config['ADMISSION_CLIENT_HEADER']
+    return (header and request.headers.get(header)) or request.remote_addr or 'unknown'
+
+def too_busy(rejected):
+    """429 response telling the client when to try again"""
+    response = jsonify({'error': f'{rejected} - please try again later', 'retry_after': rejected.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response
+
+def stream_zip(entries, finish, archive_name, on_close):
+    """
+    Stream the PDFs of started entries as a ZIP archive with a manifest.json
+    
+    finish(entry) waits for an entry and describes it, as _finish_batch_document
+    does; each successful PDF is added as <index>_<filename>. on_close runs
+    once the last PDF has been written
+    """
+    def finished_pdfs():
+        try:
+            for entry in entries:
+                result = finish(entry)
+                pdf_file = storage.open(result['filename']) if result['success'] else None
+                if pdf_file is not None:
+                    yield f"{result['index']:04d}_{result['filename']}", pdf_file
+        finally:
+            on_close()
+    
+    manifest = lambda: {'documents': [finish(entry) for entry in entries]}
+    response = Response(iter_zip(finished_pdfs(), manifest), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{archive_name}"'
+    return response
+
+@app.before_request
+def start_timers():
+    metrics.begin_request()
+
+@app.before_request
+def start_retention():
+    # Started by the first request each serving process handles, not at
+    # import: under gunicorn --preload the import runs in the master, and
+    # its thread would not be carried into the forked workers
+    retention.start()
+
+@app.after_request
+def add_server_timing(response):
+    """Report where the request's time went as a Server-Timing header"""
+    timings = metrics.end_request(request.endpoint)
+    if timings:
+        response.headers['Server-Timing'] = server_timing(timings)
+    return response
+
 @app.route('/')
 def index():
     """Main landing page with text input and theme selection"""
@@ -47,93 +323,704 @@ def index():
 def generate():
     """
     Process text input and generate PDF with selected theme
-    Returns JSON with status and download URL
+    Returns JSON with status and download URL, a job id when mode=job,
+    or the PDF itself when stream=1. With preview=1 only the first
+    preview_pages pages are rendered; combined with mode=job the full
+    render is queued as well and its job id returned alongside the preview
+    (without a worker pool, the full PDF is rendered instead of the preview)
     """
+    uploaded_images = []
+    release_images = True
     try:
         # Get form data
         text_content = request.form.get('content', '')
         theme = request.form.get('theme', 'academic')
         alignment = request.form.get('alignment', 'left')
+        wants_job = request.values.get('mode') == 'job'
+        job_mode = wants_job and job_queue.enabled
+        stream = request.values.get('stream') == '1'
+        profile = request.values.get('profile', app.config['OUTPUT_PROFILE'])
+        image_dpi = request.form.get('image_dpi', get_profile(profile).image_dpi, type=int)
+        preview = request.values.get('preview') == '1'
+        preview_pages = request.values.get('preview_pages', app.config['PREVIEW_PAGES'], type=int)
+        
+        # preview=1&mode=job asks for the full PDF too; with job mode disabled
+        # that render could never be queued, so render the full PDF instead
+        if preview and wants_job and not job_mode:
+            preview = False
+        
+        # A .txt/.md upload takes the place of the content field and is parsed
+        # as a stream, so large documents are never held in memory as one string
+        document = request.files.get('document')
+        if not (document and document.filename and allowed_document(document.filename)):
+            document = None
         
         # Validate inputs
-        if not text_content.strip():
+        if document is None and not text_content.strip():
             return jsonify({'error': 'Please provide some text content'}), 400
         
-        if theme not in THEMES:
-            return jsonify({'error': 'Invalid theme selected'}), 400
+        try:
+            validate_render_options(theme, alignment, profile, image_dpi)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Handle image uploads
-        uploaded_images = []
-        files = request.files.getlist('images')
+        if preview and not (preview_pages and 1 <= preview_pages <= app.config['PREVIEW_MAX_PAGES']):
+            return jsonify({'error': f"preview_pages must be between 1 and {app.config['PREVIEW_MAX_PAGES']}"}), 400
         
-        for file in files:
-            if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                unique_filename = f"{timestamp}_{filename}"
-                filepath = os.path.join(app.config['IMAGE_FOLDER'], unique_filename)
-                file.save(filepath)
-                uploaded_images.append(filepath)
+        # Handle image uploads (identical images share one stored file)
+        uploaded_images = save_uploaded_images()
+        
+        # Reuse a previous render of the same content, theme, alignment and images
+        with metrics.stage('cache'):
+            text_source = document.stream if document else text_content
+            cache_key = render_key(text_source, theme, alignment, uploaded_images,
+                                   options=(f'dpi={image_dpi}', f'profile={profile}'))
+            filename = render_cache.get(cache_key)
+        if filename and stream:
+            return send_stored(filename)
+        if filename and job_mode:
+            job_id = job_queue.add_finished(filename)
+            return jsonify({'success': True, 'job_id': job_id, 'status': 'done',
+                            'filename': filename, 'cached': True}), 202
+        if filename:
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'cached': True,
+                'message': 'PDF generated successfully!'
+            })
+        
+        filename = render_cache.filename_for(cache_key, theme)
+        filepath = scratch_path(filename)
+        
+        # Size-based cost estimate for renders whose text is not parsed here
+        quick_cost = estimate_size(document_size(document) if document else len(text_content),
+                                   uploaded_images).seconds
+        
+        # Render just the first pages; the full document can be queued alongside
+        if preview:
+            with metrics.stage('cache'):
+                preview_key = render_key(text_source, theme, alignment, uploaded_images,
+                                         options=(f'dpi={image_dpi}', f'profile={profile}', f'preview={preview_pages}'))
+                preview_name = render_cache.get(preview_key)
+            cached_preview = preview_name is not None
+            if not cached_preview:
+                preview_name = render_cache.filename_for(preview_key, theme)
+                lines = iter_lines(document.stream) if document else text_content.split('\n')
+                preview_path = scratch_path(preview_name)
+                with admission.admit(client_id(), min(quick_cost, app.config['PREVIEW_TIME_BUDGET'])):
+                    generate_preview(iter_blocks(lines, uploaded_images), theme, preview_path, alignment,
+                                     image_dpi, preview_pages, app.config['PREVIEW_TIME_BUDGET'], profile)
+                store_render(preview_key, preview_name, preview_path)
+            if stream:
+                return send_stored(preview_name)
+            
+            result = {'success': True, 'filename': preview_name, 'preview': True, 'cached': cached_preview,
+                      'message': 'Preview generated successfully!'}
+            if job_mode:
+                result['job_id'] = queue_render(cache_key, filename, text_content, document, uploaded_images,
+                                                theme, alignment, image_dpi, profile, quick_cost)
+                release_images = False
+            return jsonify(result)
+        
+        # Hand the render to a worker process and return straight away
+        if job_mode:
+            job_id = queue_render(cache_key, filename, text_content, document, uploaded_images,
+                                  theme, alignment, image_dpi, profile, quick_cost)
+            release_images = False
+            return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'}), 202
+        
+        # Under the ASGI server the render runs on the worker pool; the request
+        # thread only waits, so renders stay capped at RENDER_WORKERS
+        if app.config['RENDER_IN_POOL'] and job_queue.enabled and not stream:
+            with admission.admit(client_id(), quick_cost), metrics.stage('render'):
+                job_queue.run(render_document, text_content, uploaded_images, theme, filepath, alignment,
+                              save_document(cache_key, document), image_dpi, profile).result()
+            store_render(cache_key, filename, filepath)
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'cached': False,
+                'message': 'PDF generated successfully!'
+            })
         
         # Parse the text content (detect markdown-like structure)
-        parsed_content = parse_text(text_content, uploaded_images)
+        if document:
+            parsed_content = metrics.iter_stage('parse', iter_blocks(iter_lines(document.stream), uploaded_images))
+            cost = quick_cost
+        else:
+            parsed_content = parse_text(text_content, uploaded_images)
+            # Layout estimate, floored by the text size (see utils.estimator for what it misses)
+            cost = admission_seconds(estimate_render(parsed_content, theme, alignment), len(text_content),
+                                     uploaded_images)
+        ticket = admission.admit(client_id(), cost)
         
-        # Generate unique filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'velvetdocs_{theme}_{timestamp}.pdf'
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        # Send the PDF straight back without storing it in the output folder
+        if stream:
+            with ticket:
+                pdf_file, size = generate_pdf_stream(parsed_content, theme, alignment,
+                                                     app.config['STREAM_SPOOL_MAX_BYTES'], image_dpi, profile)
+            response = Response(wrap_file(request.environ, pdf_file),
+                                mimetype='application/pdf', direct_passthrough=True)
+            response.content_length = size
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
         
         # Generate PDF with selected theme and alignment
-        generate_pdf(parsed_content, theme, filepath, alignment)
+        with ticket:
+            generate_pdf(parsed_content, theme, filepath, alignment, image_dpi, profile)
+        store_render(cache_key, filename, filepath)
         
         return jsonify({
             'success': True,
             'filename': filename,
+            'cached': False,
             'message': 'PDF generated successfully!'
         })
         
+    except Rejected as e:
+        return too_busy(e)
     except Exception as e:
         return jsonify({'error': f'Error generating PDF: {str(e)}'}), 500
+    
+    finally:
+        # Queued jobs release their images when they finish
+        if release_images:
+            image_store.release(uploaded_images)
+
+@app.route('/estimate', methods=['POST'])
+def estimate():
+    """
+    Predict the page count and render seconds of a /generate request
+    
+    Takes the same content/document, theme, alignment, profile, image_dpi
+    and images fields; nothing is rendered. Also reports which admission lane the render
+    would use
+    """
+    uploaded_images = []
+    try:
+        text_content = request.form.get('content', '')
+        theme = request.form.get('theme', 'academic')
+        alignment = request.form.get('alignment', 'left')
+        profile = request.values.get('profile', app.config['OUTPUT_PROFILE'])
+        image_dpi = request.form.get('image_dpi', get_profile(profile).image_dpi, type=int)
+        document = request.files.get('document')
+        if not (document and document.filename and allowed_document(document.filename)):
+            document = None
+        
+        if document is None and not text_content.strip():
+            return jsonify({'error': 'Please provide some text content'}), 400
+        try:
+            validate_render_options(theme, alignment, profile, image_dpi)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        uploaded_images = save_uploaded_images()
+        
+        size = document_size(document) if document else len(text_content)
+        lines = iter_lines(document.stream) if document else text_content.split('\n')
+        result = estimate_render(iter_blocks(lines, uploaded_images), theme, alignment)
+        lane = admission.lane_for(admission_seconds(result, size, uploaded_images))
+        return jsonify(dict(result.to_dict(), lane=lane.name))
+    
+    except Exception as e:
+        return jsonify({'error': f'Error estimating PDF: {str(e)}'}), 500
+    
+    finally:
+        image_store.release(uploaded_images)
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """
+    Render many documents in one request
+    
+    Expects a 'documents' list (a JSON form field, or the JSON body) of
+    {content, theme, alignment, profile, image_dpi, images} objects, where images are
+    indices into the uploaded 'images' files. Documents render in parallel on
+    the worker pool; a bad document only fails its own entry. Returns a
+    streamed ZIP with a manifest.json, or just the manifest when output=manifest
+    """
+    uploaded_images = []
+    release_images = True
+    ticket = None
+    try:
+        if request.is_json:
+            payload = request.get_json(silent=True) or {}
+            documents = payload.get('documents')
+            output = payload.get('output', 'zip')
+        else:
+            documents = json.loads(request.form.get('documents', 'null'))
+            output = request.form.get('output', 'zip')
+        
+        if not isinstance(documents, list) or not documents:
+            return jsonify({'error': 'Please provide a list of documents'}), 400
+        if len(documents) > app.config['BATCH_MAX_DOCUMENTS']:
+            return jsonify({'error': f"At most {app.config['BATCH_MAX_DOCUMENTS']} documents per batch"}), 400
+        if output not in ('zip', 'manifest'):
+            return jsonify({'error': 'Invalid output selected'}), 400
+        
+        uploaded_images = save_uploaded_images()
+        
+        # The whole batch is admitted as one render, costed by its total text
+        text_length = sum(len(document['content']) for document in documents
+                          if isinstance(document, dict) and isinstance(document.get('content'), str))
+        ticket = admission.admit(client_id(), estimate_size(text_length, uploaded_images).seconds)
+        
+        entries = [_start_batch_document(index, document, uploaded_images)
+                   for index, document in enumerate(documents)]
+        
+        if output == 'manifest':
+            return jsonify({'documents': [_finish_batch_document(entry) for entry in entries]})
+        
+        def finished():
+            image_store.release(uploaded_images)
+            ticket.release()
+        
+        response = stream_zip(entries, _finish_batch_document, 'velvetdocs_batch.zip', finished)
+        release_images = False
+        return response
+        
+    except json.JSONDecodeError:
+        return jsonify({'error': 'documents must be valid JSON'}), 400
+    except Rejected as e:
+        return too_busy(e)
+    except Exception as e:
+        return jsonify({'error': f'Error generating PDFs: {str(e)}'}), 500
+    
+    finally:
+        # A streamed ZIP releases its images and ticket once the last PDF is written
+        if release_images:
+            image_store.release(uploaded_images)
+            if ticket is not None:
+                ticket.release()
+
+def _start_batch_document(index, document, uploaded_images):
+    """Validate one batch document and start rendering it unless it is cached"""
+    entry = {'index': index}
+    try:
+        if not isinstance(document, dict):
+            raise ValueError('Document must be an object')
+        text_content = document.get('content') or ''
+        theme = document.get('theme', 'academic')
+        alignment = document.get('alignment', 'left')
+        profile = document.get('profile', app.config['OUTPUT_PROFILE'])
+        image_refs = document.get('images', [])
+        
+        # Fields come from JSON, so check their types before any lookup or hashing
+        if not isinstance(text_content, str) or not text_content.strip():
+            raise ValueError('Please provide some text content')
+        # An unhashable profile must not reach the lookup; it fails validation below
+        default_dpi = get_profile(profile).image_dpi if isinstance(profile, str) else None
+        image_dpi = document.get('image_dpi', default_dpi)
+        validate_render_options(theme, alignment, profile, image_dpi)
+        if not isinstance(image_refs, list) or not all(
+                isinstance(ref, int) and 0 <= ref < len(uploaded_images) for ref in image_refs):
+            raise ValueError('Image references must be indices of uploaded images')
+        image_paths = [uploaded_images[ref] for ref in image_refs]
+        
+        cache_key = render_key(text_content, theme, alignment, image_paths,
+                               options=(f'dpi={image_dpi}', f'profile={profile}'))
+        filename = render_cache.get(cache_key)
+        if filename:
+            entry.update(filename=filename, cached=True)
+            return entry
+        
+        filename = render_cache.filename_for(cache_key, theme)
+        filepath = scratch_path(filename)
+        task = (render_document, text_content, image_paths, theme, filepath, alignment, None, image_dpi, profile)
+        entry.update(filename=filename, cached=False, cache_key=cache_key, filepath=filepath, task=task)
+        if job_queue.enabled:
+            entry['future'] = job_queue.run(*task)
+    except ValueError as e:
+        entry['error'] = str(e)
+    except Exception as e:
+        # Whatever goes wrong with one document only fails its own entry
+        entry.pop('task', None)
+        entry['error'] = f'Error generating PDF: {str(e)}'
+    return entry
+
+def _finish_batch_document(entry):
+    """Wait for a batch document (rendering inline without workers) and describe it"""
+    if 'task' in entry:
+        task = entry.pop('task')
+        future = entry.pop('future', None)
+        try:
+            if future is not None:
+                future.result()
+            else:
+                task[0](*task[1:])
+            store_render(entry.pop('cache_key'), entry['filename'], entry.pop('filepath'))
+        except Exception as e:
+            entry['error'] = f'Error generating PDF: {str(e)}'
+    
+    if 'error' in entry:
+        return {'index': entry['index'], 'success': False, 'error': entry['error']}
+    return {'index': entry['index'], 'success': True,
+            'filename': entry['filename'], 'cached': entry['cached']}
+
+@app.route('/generate/merge', methods=['POST'])
+def generate_merge():
+    """
+    Mail merge: render a template once per record of an uploaded file
+    
+    The content field is a template with {{field}} placeholders, and
+    'records' a .csv (header row first) or .jsonl upload. The template is
+    parsed once; workers compile it once per chunk of records and only
+    rebuild the blocks that hold placeholders. output=combined returns one
+    PDF with every record starting on a new page, output=zip a streamed ZIP
+    with one PDF per record and a manifest.json, and output=manifest just
+    the manifest. theme, alignment, profile, image_dpi and images work as
+    for /generate
+    """
+    uploaded_images = []
+    release_images = True
+    ticket = None
+    try:
+        text_content = request.form.get('content', '')
+        theme = request.form.get('theme', 'academic')
+        alignment = request.form.get('alignment', 'left')
+        profile = request.values.get('profile', app.config['OUTPUT_PROFILE'])
+        image_dpi = request.form.get('image_dpi', get_profile(profile).image_dpi, type=int)
+        output = request.values.get('output', 'combined')
+        records_file = request.files.get('records')
+        
+        if not text_content.strip():
+            return jsonify({'error': 'Please provide a template'}), 400
+        if not (records_file and records_file.filename):
+            return jsonify({'error': 'Please upload a records file'}), 400
+        try:
+            validate_render_options(theme, alignment, profile, image_dpi)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if output not in ('combined', 'zip', 'manifest'):
+            return jsonify({'error': 'Invalid output selected'}), 400
+        
+        records_data = records_file.read()
+        try:
+            records = read_records(records_data, records_file.filename.rsplit('.', 1)[-1].lower(),
+                                   app.config['MERGE_MAX_RECORDS'])
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return jsonify({'error': str(e)}), 400
+        if not records:
+            return jsonify({'error': 'The records file has no records'}), 400
+        
+        uploaded_images = save_uploaded_images()
+        
+        with metrics.stage('parse'):
+            parsed_content = parse_text(text_content, uploaded_images)
+        fields = set().union(*map(block_fields, parsed_content))
+        
+        if output == 'combined':
+            for index, record in enumerate(records):
+                missing = missing_fields(record, fields)
+                if missing:
+                    return jsonify({'error': f"Record {index} has no value for {', '.join(missing)}"}), 400
+            
+            cache_key = render_key(text_content, theme, alignment, uploaded_images,
+                                   options=(f'dpi={image_dpi}', f'profile={profile}',
+                                            f'merge={hashlib.sha256(records_data).hexdigest()}'))
+            filename = render_cache.get(cache_key)
+            if filename:
+                return jsonify({'success': True, 'filename': filename, 'cached': True, 'records': len(records)})
+            
+            filename = render_cache.filename_for(cache_key, theme)
+            filepath = scratch_path(filename)
+            cost = admission_seconds(estimate_render(parsed_content, theme, alignment), len(text_content),
+                                     uploaded_images) * len(records)
+            task = (render_merge_combined, parsed_content, records, theme, filepath, alignment, image_dpi, profile)
+            with admission.admit(client_id(), cost), metrics.stage('render'):
+                if job_queue.enabled:
+                    job_queue.run(*task).result()
+                else:
+                    task[0](*task[1:])
+            store_render(cache_key, filename, filepath)
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'cached': False,
+                'records': len(records),
+                'message': 'PDF generated successfully!'
+            })
+        
+        # One PDF per record; the whole merge is admitted as one render
+        cost = admission_seconds(estimate_render(parsed_content, theme, alignment), len(text_content),
+                                 uploaded_images) * len(records)
+        ticket = admission.admit(client_id(), cost)
+        entries = _start_merge_records(parsed_content, records, fields, text_content, theme, alignment,
+                                       image_dpi, profile, uploaded_images)
+        
+        if output == 'manifest':
+            return jsonify({'documents': [_finish_merge_record(entry) for entry in entries]})
+        
+        def finished():
+            image_store.release(uploaded_images)
+            ticket.release()
+        
+        response = stream_zip(entries, _finish_merge_record, 'velvetdocs_merge.zip', finished)
+        release_images = False
+        return response
+        
+    except Rejected as e:
+        return too_busy(e)
+    except Exception as e:
+        return jsonify({'error': f'Error generating PDFs: {str(e)}'}), 500
+    
+    finally:
+        # A streamed ZIP releases its images and ticket once the last PDF is written
+        if release_images:
+            image_store.release(uploaded_images)
+            if ticket is not None:
+                ticket.release()
+
+def _start_merge_records(parsed_content, records, fields, text_content, theme, alignment, image_dpi, profile,
+                         uploaded_images):
+    """Look up each record in the render cache and start chunks of the rest on the worker pool"""
+    entries = []
+    pending = []
+    for index, record in enumerate(records):
+        entry = {'index': index}
+        entries.append(entry)
+        missing = missing_fields(record, fields)
+        if missing:
+            entry['error'] = f"Record has no value for {', '.join(missing)}"
+            continue
+        values = json.dumps({name: str(record[name]) for name in sorted(fields)})
+        cache_key = render_key(text_content, theme, alignment, uploaded_images,
+                               options=(f'dpi={image_dpi}', f'profile={profile}', f'record={values}'))
+        filename = render_cache.get(cache_key)
+        if filename:
+            entry.update(filename=filename, cached=True)
+            continue
+        filename = render_cache.filename_for(cache_key, theme)
+        entry.update(filename=filename, cached=False, cache_key=cache_key, filepath=scratch_path(filename))
+        pending.append((entry, record))
+    
+    chunk_size = app.config['MERGE_CHUNK_RECORDS']
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        task = (render_merge, parsed_content, [record for _, record in chunk], theme,
+                [entry['filepath'] for entry, _ in chunk], alignment, image_dpi, profile)
+        shared = {'task': task}
+        if job_queue.enabled:
+            shared['future'] = job_queue.run(*task)
+        for position, (entry, _) in enumerate(chunk):
+            entry.update(chunk=shared, position=position)
+    return entries
+
+def _finish_merge_record(entry):
+    """Wait for a record's chunk (rendering it inline without workers) and describe the record"""
+    if 'chunk' in entry:
+        chunk = entry.pop('chunk')
+        try:
+            if 'errors' not in chunk:
+                future = chunk.get('future')
+                chunk['errors'] = future.result() if future is not None else chunk['task'][0](*chunk['task'][1:])
+            error = chunk['errors'][entry.pop('position')]
+            if error is None:
+                store_render(entry.pop('cache_key'), entry['filename'], entry.pop('filepath'))
+            else:
+                entry['error'] = f'Error generating PDF: {error}'
+        except Exception as e:
+            entry['error'] = f'Error generating PDF: {str(e)}'
+    
+    if 'error' in entry:
+        return {'index': entry['index'], 'success': False, 'error': entry['error']}
+    return {'index': entry['index'], 'success': True,
+            'filename': entry['filename'], 'cached': entry['cached']}
+
+@app.route('/generate/themes', methods=['POST'])
+def generate_themes():
+    """
+    Render one submission in several themes
+    
+    'themes' is a comma-separated list of theme names, or 'all' (the
+    default). The text is parsed and its images prepared once for every
+    theme. output=links renders each theme in parallel on the worker pool
+    and returns one download per theme, sharing the render cache with
+    /generate; output=sheet returns a single comparison PDF showing the
+    first 'pages' pages of each theme side by side. content, alignment,
+    profile, image_dpi and images work as for /generate
+    """
+    uploaded_images = []
+    ticket = None
+    try:
+        text_content = request.form.get('content', '')
+        theme_field = request.values.get('themes', 'all')
+        alignment = request.form.get('alignment', 'left')
+        profile = request.values.get('profile', app.config['OUTPUT_PROFILE'])
+        image_dpi = request.form.get('image_dpi', get_profile(profile).image_dpi, type=int)
+        output = request.values.get('output', 'links')
+        pages = request.values.get('pages', 1, type=int)
+        
+        themes = list(THEMES) if theme_field == 'all' else list(dict.fromkeys(
+            name.strip() for name in theme_field.split(',') if name.strip()))
+        
+        if not text_content.strip():
+            return jsonify({'error': 'Please provide some text content'}), 400
+        if not themes:
+            return jsonify({'error': 'Invalid theme selected'}), 400
+        try:
+            for theme in themes:
+                validate_render_options(theme, alignment, profile, image_dpi)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if output not in ('links', 'sheet'):
+            return jsonify({'error': 'Invalid output selected'}), 400
+        if not (pages and 1 <= pages <= app.config['COMPARE_MAX_PAGES']):
+            return jsonify({'error': f"pages must be between 1 and {app.config['COMPARE_MAX_PAGES']}"}), 400
+        
+        uploaded_images = save_uploaded_images()
+        
+        options = (f'dpi={image_dpi}', f'profile={profile}')
+        with metrics.stage('parse'):
+            parsed_content = parse_text(text_content, uploaded_images)
+        estimates = [estimate_render(parsed_content, theme, alignment) for theme in themes]
+        
+        if output == 'sheet':
+            cache_key = render_key(text_content, 'comparison', alignment, uploaded_images,
+                                   options=options + (f"compare={','.join(themes)}", f'pages={pages}'))
+            filename = render_cache.get(cache_key)
+            if filename:
+                return jsonify({'success': True, 'filename': filename, 'cached': True, 'themes': themes})
+            
+            # Only the first pages of each theme are laid out
+            cost = sum(estimate.seconds * min(1, pages / estimate.pages) for estimate in estimates)
+            ticket = admission.admit(client_id(), cost)
+            filename = render_cache.filename_for(cache_key, 'comparison')
+            filepath = scratch_path(filename)
+            parsed_content = prepare_block_images(parsed_content, image_dpi, profile)
+            task = (render_comparison, parsed_content, themes, filepath, alignment, image_dpi, profile, pages)
+            with metrics.stage('render'):
+                if job_queue.enabled:
+                    job_queue.run(*task).result()
+                else:
+                    task[0](*task[1:])
+            store_render(cache_key, filename, filepath)
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'cached': False,
+                'themes': themes,
+                'message': 'Comparison generated successfully!'
+            })
+        
+        # Every theme is admitted together as one render
+        entries = []
+        for index, theme in enumerate(themes):
+            cache_key = render_key(text_content, theme, alignment, uploaded_images, options=options)
+            filename = render_cache.get(cache_key)
+            if filename:
+                entries.append({'index': index, 'filename': filename, 'cached': True})
+                continue
+            filename = render_cache.filename_for(cache_key, theme)
+            entries.append({'index': index, 'filename': filename, 'cached': False, 'cache_key': cache_key,
+                            'filepath': scratch_path(filename),
+                            'estimate': admission_seconds(estimates[index], len(text_content), uploaded_images)})
+        
+        pending = [entry for entry in entries if not entry['cached']]
+        if pending:
+            ticket = admission.admit(client_id(), sum(entry.pop('estimate') for entry in pending))
+            parsed_content = prepare_block_images(parsed_content, image_dpi, profile)
+            for entry in pending:
+                entry['task'] = (render_parsed, parsed_content, themes[entry['index']], entry['filepath'],
+                                 alignment, image_dpi, profile)
+                if job_queue.enabled:
+                    entry['future'] = job_queue.run(*entry['task'])
+        
+        with metrics.stage('render'):
+            documents = [dict(_finish_batch_document(entry), theme=themes[entry['index']]) for entry in entries]
+        return jsonify({'success': True, 'documents': documents})
+        
+    except Rejected as e:
+        return too_busy(e)
+    except Exception as e:
+        return jsonify({'error': f'Error generating PDFs: {str(e)}'}), 500
+    
+    finally:
+        image_store.release(uploaded_images)
+        if ticket is not None:
+            ticket.release()
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the status of a queued render and its filename once done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
 
 @app.route('/download/<filename>')
 def download(filename):
     """Serve the generated PDF file"""
     try:
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if os.path.exists(filepath):
-            return send_file(filepath, as_attachment=True, download_name=filename)
-        else:
-            return "File not found", 404
+        if valid_name(filename):
+            render_cache.touch(filename)
+            response = send_stored(filename)
+            if response is not None:
+                return response
+        return "File not found", 404
     except Exception as e:
         return f"Error downloading file: {str(e)}", 500
 
+@app.route('/cache/stats')
+def cache_stats():
+    """Report render cache usage and hit/miss counters"""
+    return jsonify(render_cache.stats())
+
+@app.route('/retention/stats')
+def retention_stats():
+    """Report retention sweeper counters and tracked disk usage"""
+    return jsonify(retention.stats())
+
+@app.route('/admission/stats')
+def admission_stats():
+    """Report running, queued, admitted and rejected renders per lane"""
+    return jsonify(admission.stats())
+
+@app.route('/startup/stats')
+def startup_stats():
+    """Report how long startup and each warm-up step took"""
+    return jsonify({'startup_seconds': startup_seconds, 'warmup': warmup_report})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose stage timings, PDF sizes and cache counters in Prometheus text format"""
+    if not metrics.enabled:
+        return "Metrics are disabled", 404
+    cache = render_cache.stats()
+    sweeper = retention.stats()
+    images = image_store.stats()
+    admission_lanes = admission.stats()['lanes']
+    markup_cache = markup.cache_stats()
+    gauges = [
+        ('velvetdocs_render_cache_hits_total', 'counter', 'Render cache hits', cache['hits']),
+        ('velvetdocs_render_cache_misses_total', 'counter', 'Render cache misses', cache['misses']),
+        ('velvetdocs_render_cache_evictions_total', 'counter', 'PDFs evicted from the render cache', cache['evictions']),
+        ('velvetdocs_render_cache_entries', 'gauge', 'PDFs in the render cache', cache['entries']),
+        ('velvetdocs_render_cache_bytes', 'gauge', 'Bytes of PDFs in the render cache', cache['bytes']),
+        ('velvetdocs_retention_tracked_bytes', 'gauge', 'Bytes of files tracked by the sweeper', sweeper['tracked_bytes']),
+        ('velvetdocs_retention_removed_bytes_total', 'counter', 'Bytes removed by the sweeper', sweeper['removed_bytes']),
+        ('velvetdocs_referenced_images', 'gauge', 'Stored images in use by a render', images['referenced_images']),
+        ('velvetdocs_markup_cache_hits_total', 'counter', 'Inline markup cache hits', markup_cache['hits']),
+        ('velvetdocs_markup_cache_misses_total', 'counter', 'Inline markup cache misses', markup_cache['misses']),
+        *[(f'velvetdocs_admission_{name}_rejected_total', 'counter', f'Renders refused by the {name} lane',
+           lane['rejected']) for name, lane in admission_lanes.items()],
+        *[(f'velvetdocs_admission_{name}_queued', 'gauge', f'Renders waiting in the {name} lane',
+           lane['queued']) for name, lane in admission_lanes.items()],
+        ('velvetdocs_startup_seconds', 'gauge', 'Time taken to load and warm up the app', f'{startup_seconds:.6f}'),
+        ('velvetdocs_warmup_seconds', 'gauge', 'Time spent on the startup warm-up', f"{warmup_report['total']:.6f}")
+    ]
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
 @app.route('/preview/<filename>')
 def preview(filename):
-    """Display PDF preview page"""
-    return render_template('result.html', filename=filename)
+    """Display PDF preview page, switching to the full PDF once ?job=<id> is done"""
+    return render_template('result.html', filename=filename, job_id=request.args.get('job'))
 
-# Clean up old files
-@app.before_request
-def cleanup_old_files():
-    """Remove PDF and image files older than 1 hour"""
-    try:
-        current_time = datetime.now().timestamp()
-        
-        # Clean PDFs
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file_time = os.path.getmtime(filepath)
-            if current_time - file_time > 3600:
-                os.remove(filepath)
-        
-        # Clean images
-        for filename in os.listdir(app.config['IMAGE_FOLDER']):
-            filepath = os.path.join(app.config['IMAGE_FOLDER'], filename)
-            file_time = os.path.getmtime(filepath)
-            if current_time - file_time > 3600:
-                os.remove(filepath)
-    except:
-        pass
+# Everything loaded so far lives as long as the process; keep it out of the
+# garbage collector so pre-forked workers share it copy-on-write
+startup_seconds = time.perf_counter() - STARTED
+freeze_heap()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,22 @@
+"""
+VelvetDocs - ASGI entry point
+Serves the app from an asyncio server, e.g.:
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+Uploads are received on the event loop, requests are handled on a bounded
+thread pool (REQUEST_THREADS), and /generate renders on the worker process
+pool, so one process accepts many concurrent clients while rendering stays
+capped at RENDER_WORKERS.
+"""
+
+from app import app
+from utils.asgi import AsgiAdapter
+
+app.config['RENDER_IN_POOL'] = True
+
+application = AsgiAdapter(
+    app.wsgi_app,
+    max_threads=app.config['REQUEST_THREADS'],
+    spool_max_size=app.config['UPLOAD_SPOOL_MAX_BYTES'],
+    max_body=app.config['MAX_CONTENT_LENGTH']
+)
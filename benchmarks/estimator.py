@@ -0,0 +1,220 @@
+"""
+Estimator Calibration
+Compares utils.estimator predictions with real renders, and refits its constants
+
+Run from the repository root:
+    python -m benchmarks.estimator
+    python -m benchmarks.estimator --fit
+
+Every theme renders synthetic documents of each --sizes line count, with
+and without images, plus the --paragraphs shapes: a few paragraphs long
+enough to run over several pages each, and thousands of one-sentence
+ones, so text volume and block count can be told apart. The table shows
+predicted and actual pages and seconds. With --fit, LINE_FILL, the time coefficients and the per-theme
+factors that best match these renders are printed, ready to paste into
+utils/estimator.py. The
+exit status is 1 when the mean page or time error is above --max-page-error
+or --max-time-error, so the script doubles as an accuracy check. It is also 1
+when a document that took more than twice --fast-cost to render would be
+admitted to the fast lane.
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_images, synthetic_paragraphs, synthetic_text
+from utils import estimator
+from utils.admission import AdmissionController
+from utils import images as image_prep
+from utils.parser import parse_text
+from utils.pdf_generator import (
+    THEME_CLASSES, FlowableFeed, build_document, create_document, get_stylesheet, get_theme, iter_flowables
+)
+
+# Time model features, in the order of the fitted coefficients
+FEATURES = ('BASE_SECONDS', 'PAGE_SECONDS', 'BLOCK_SECONDS', 'CHAR_SECONDS', 'LINE_SECONDS', 'SPLIT_LINE_SECONDS',
+            'PIXEL_SECONDS', 'IMAGE_SECONDS')
+
+# Text volume terms the fit keeps even when a correlated count could stand in for them
+REQUIRED_FEATURES = ('LINE_SECONDS', 'SPLIT_LINE_SECONDS')
+
+
+def render(parsed_content, theme_name):
+    """Render for real, returning (pages, seconds)"""
+    theme = get_theme(theme_name)
+    styles = get_stylesheet(theme_name, 'left')
+    doc = create_document(io.BytesIO(), theme)
+    started = time.perf_counter()
+    build_document(doc, FlowableFeed(iter_flowables(parsed_content, styles)), theme)
+    return doc.page, time.perf_counter() - started
+
+
+def documents(sizes, paragraphs, image_paths):
+    """Yield (label, text, image paths) for every document in the calibration corpus"""
+    for lines in sizes:
+        yield f'{lines} lines', synthetic_text(lines), []
+        yield f'{lines} lines+img', synthetic_text(lines, image_count=len(image_paths)), image_paths
+    for count, sentences in paragraphs:
+        yield f'{count}x{sentences} para', synthetic_paragraphs(count, sentences), []
+
+
+def collect(sizes, paragraphs, themes, image_paths):
+    samples = []
+    for label, text, images in documents(sizes, paragraphs, image_paths):
+        parsed_content = parse_text(text, list(images))
+        for theme_name in themes:
+            if images:
+                render(parsed_content, theme_name)  # prepare images once, outside the timing
+            pages, seconds = render(parsed_content, theme_name)
+            samples.append({'document': label, 'theme': theme_name, 'parsed': parsed_content,
+                            'size': len(text), 'images': images, 'pages': pages, 'seconds': seconds})
+    return samples
+
+
+def mean_errors(samples):
+    """Mean relative page and time error of the current estimator constants"""
+    page_error = time_error = 0.0
+    for sample in samples:
+        estimate = estimator.estimate_render(sample['parsed'], sample['theme'])
+        sample['estimate'] = estimate
+        page_error += abs(estimate.pages - sample['pages']) / sample['pages']
+        time_error += abs(estimate.seconds - sample['seconds']) / sample['seconds']
+    return page_error / len(samples), time_error / len(samples)
+
+
+def misrouted(samples, fast_cost):
+    """Samples that took over twice fast_cost to render but would be admitted to the fast lane"""
+    controller = AdmissionController(1, 1, fast_cost=fast_cost)
+    return [sample for sample in samples
+            if sample['seconds'] > 2 * fast_cost
+            and controller.lane_for(estimator.admission_seconds(
+                sample['estimate'], sample['size'], sample['images'])).name == 'fast']
+
+
+def fit_line_fill(samples):
+    best = None
+    for step in range(70, 101):
+        estimator.LINE_FILL = step / 100
+        page_error, _ = mean_errors(samples)
+        if best is None or page_error < best[0]:
+            best = (page_error, estimator.LINE_FILL)
+    estimator.LINE_FILL = best[1]
+    return best[1]
+
+
+def fit_time(samples):
+    """
+    Non-negative least squares fit of the time model, by relative error
+
+    Columns are scaled to comparable magnitudes, and any coefficient that
+    comes out negative is dropped and the rest refitted (the counts are
+    strongly correlated, so an unconstrained fit trades them off wildly).
+    REQUIRED_FEATURES are never dropped: if one comes out negative, the
+    most negative of the others goes instead.
+    Theme factors are fitted afterwards, as each theme's mean ratio of
+    actual to predicted time.
+    """
+    estimator.THEME_FACTORS = {}
+    rows = []
+    for sample in samples:
+        estimate = estimator.estimate_render(sample['parsed'], sample['theme'])
+        features = (1.0, estimate.pages, estimate.blocks, estimate.characters, estimate.lines,
+                    estimate.split_lines, estimate.image_pixels, estimate.images)
+        weight = 1 / sample['seconds']
+        rows.append(([value * weight for value in features], sample['seconds'] * weight))
+    scales = [max(abs(row[i]) for row, _ in rows) or 1.0 for i in range(len(FEATURES))]
+    rows = [([value / scale for value, scale in zip(row, scales)], target) for row, target in rows]
+
+    active = [i for i, scale in enumerate(scales) if any(row[i] for row, _ in rows)]
+    while True:
+        solution = _least_squares(rows, active)
+        negative = [i for i in active if solution[i] < 0]
+        if not negative:
+            break
+        optional = [i for i in active if FEATURES[i] not in REQUIRED_FEATURES]
+        droppable = [i for i in negative if i in optional] or optional
+        if not droppable:
+            break
+        active.remove(min(droppable, key=solution.get))
+
+    coefficients = {name: max(0.0, solution.get(i, 0.0)) / scales[i] for i, name in enumerate(FEATURES)}
+    for name, value in coefficients.items():
+        setattr(estimator, name, value)
+
+    ratios = {}
+    for sample in samples:
+        estimate = estimator.estimate_render(sample['parsed'], sample['theme'])
+        if estimate.seconds > 0:
+            ratios.setdefault(sample['theme'], []).append(sample['seconds'] / estimate.seconds)
+    estimator.THEME_FACTORS = {theme: sum(values) / len(values) for theme, values in ratios.items()}
+    return coefficients
+
+
+def _least_squares(rows, columns):
+    """Solve the normal equations for the given columns by Gaussian elimination"""
+    size = len(columns)
+    matrix = [[sum(row[i] * row[j] for row, _ in rows) for j in columns]
+              + [sum(row[i] * target for row, target in rows)] for i in columns]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda r: abs(matrix[r][column]))
+        matrix[column], matrix[pivot] = matrix[pivot], matrix[column]
+        for r in range(size):
+            if r != column and matrix[column][column]:
+                factor = matrix[r][column] / matrix[column][column]
+                matrix[r] = [a - factor * b for a, b in zip(matrix[r], matrix[column])]
+    return {index: (matrix[i][size] / matrix[i][i] if matrix[i][i] else 0.0) for i, index in enumerate(columns)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='50,200,1000', help='comma-separated line counts')
+    parser.add_argument('--themes', default=','.join(THEME_CLASSES), help='comma-separated theme names')
+    parser.add_argument('--paragraphs', default='10x160,40x40,1500x1',
+                        help='comma-separated COUNTxSENTENCES paragraph documents')
+    parser.add_argument('--images', type=int, default=4, help='images in the image variant of each size')
+    parser.add_argument('--fit', action='store_true', help='refit the constants and print them')
+    parser.add_argument('--max-page-error', type=float, default=0.15)
+    parser.add_argument('--max-time-error', type=float, default=0.5)
+    parser.add_argument('--fast-cost', type=float, default=0.5, help='ADMISSION_FAST_COST to check lanes against')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        image_prep.PREPARED_IMAGE_FOLDER = os.path.join(workdir, 'prepared')
+        image_paths = synthetic_images(os.path.join(workdir, 'images'), args.images)
+        paragraphs = [tuple(int(n) for n in shape.split('x')) for shape in args.paragraphs.split(',') if shape]
+        samples = collect([int(size) for size in args.sizes.split(',')], paragraphs, args.themes.split(','),
+                          image_paths)
+
+        if args.fit:
+            line_fill = fit_line_fill(samples)
+            coefficients = fit_time(samples)
+        page_error, time_error = mean_errors(samples)
+
+    print(f"{'theme':<20}{'document':<17}{'pages':>6}{'est':>6}{'seconds':>10}{'est':>9}")
+    for sample in samples:
+        estimate = sample['estimate']
+        print(f"{sample['theme']:<20}{sample['document']:<17}{sample['pages']:>6}"
+              f"{estimate.pages:>6}{sample['seconds']:>10.3f}{estimate.seconds:>9.3f}")
+    print(f'\nmean page error {page_error:.1%}, mean time error {time_error:.1%}')
+    wrong_lane = misrouted(samples, args.fast_cost)
+    for sample in wrong_lane:
+        print(f"{sample['theme']} {sample['document']} took {sample['seconds']:.3f}s but is admitted to the fast lane")
+
+    if args.fit:
+        print('\nFitted constants for utils/estimator.py:')
+        for name, value in coefficients.items():
+            print(f'{name} = {value:.3g}')
+        factors = ', '.join(f"'{theme}': {factor:.2f}" for theme, factor in sorted(estimator.THEME_FACTORS.items()))
+        print(f'THEME_FACTORS = {{{factors}}}')
+        print(f'LINE_FILL = {line_fill:.2f}')
+
+    if page_error > args.max_page_error or time_error > args.max_time_error or wrong_lane:
+        print('\nEstimator is outside the allowed error')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Inline Markup Benchmark
+Measures utils.markup throughput in lines per second, cold and with the cache warm
+
+Run from the repository root:
+    python -m benchmarks.markup [--lines 100000] [--repeat 3] [--boilerplate 0.3]
+
+The input is synthetic_text with a share (--boilerplate) of its lines
+replaced by a handful of repeated footers, the case the LRU cache is for.
+The two-pass regex conversion that utils.markup replaced is timed too, as
+a reference (it does not escape & and <, so it is not equivalent).
+"""
+
+import argparse
+import random
+import re
+import time
+
+from benchmarks.synthetic import synthetic_text
+from utils import markup
+
+BOILERPLATE = (
+    '**Confidential** - for internal use only & not for distribution.',
+    '*Copyright 2024 Example Corp.* All rights reserved.',
+    'Questions? Contact **support** <support@example.com>.'
+)
+
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC = re.compile(r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)')
+
+
+def two_pass(text):
+    """The regex conversion used before utils.markup"""
+    return _ITALIC.sub(r'<i>\1</i>', _BOLD.sub(r'<b>\1</b>', text))
+
+
+def make_lines(line_count, boilerplate, seed=0):
+    rng = random.Random(seed)
+    lines = [line for line in synthetic_text(line_count).split('\n') if line]
+    return [rng.choice(BOILERPLATE) if rng.random() < boilerplate else line for line in lines]
+
+
+def best_of(repeat, convert, lines, before=None):
+    best = None
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        for line in lines:
+            convert(line)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs')
+    parser.add_argument('--boilerplate', type=float, default=0.3, help='share of repeated lines')
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines, args.boilerplate)
+    megabytes = sum(len(line) for line in lines) / 1e6
+    runs = [
+        ('two-pass regex', best_of(args.repeat, two_pass, lines)),
+        ('markup, cold', best_of(args.repeat, markup.to_markup, lines, markup._cached_compile.cache_clear)),
+        ('markup, uncached', best_of(args.repeat, markup._compile, lines)),
+        ('markup, warm', best_of(args.repeat, markup.to_markup, lines))
+    ]
+
+    print(f"{len(lines)} lines, {megabytes:.1f}MB, {args.boilerplate:.0%} boilerplate\n")
+    print(f"{'':<18}{'best (ms)':>12}{'lines/s':>14}{'MB/s':>8}")
+    for name, seconds in runs:
+        print(f'{name:<18}{seconds * 1000:>12.2f}{len(lines) / seconds:>14,.0f}{megabytes / seconds:>8.1f}')
+    stats = markup.cache_stats()
+    print(f"\ncache: {stats['entries']} of {stats['max_entries']} entries, {stats['hits']} hits, {stats['misses']} misses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Page Chrome Benchmark
+Compares drawing theme decorations on every page with a shared Form XObject
+
+Run from the repository root:
+    python -m benchmarks.page_chrome [--pages 500] [--repeat 3]
+
+Each page holds a single paragraph, so the decorations are a large share
+of the output and the difference is easy to see. Both variants are run for
+every theme; the last column shows which one the theme actually uses.
+"""
+
+import argparse
+import io
+import time
+
+from reportlab.platypus import PageBreak, Paragraph
+
+from benchmarks.synthetic import synthetic_lines
+from utils.pdf_generator import (
+    THEME_CLASSES, build_document, create_document, get_stylesheet, get_theme, shares_chrome
+)
+
+
+class PerPageChrome:
+    """Theme wrapper without draw_page_chrome, so every page redraws everything"""
+
+    def __init__(self, theme):
+        self.margins = theme.margins
+        self.add_page_decorations = theme.add_page_decorations
+
+
+class SharedChrome:
+    """Theme wrapper that forces shared_chrome on, whatever the theme chose"""
+
+    shared_chrome = True
+
+    def __init__(self, theme):
+        self.margins = theme.margins
+        self.draw_page_chrome = theme.draw_page_chrome
+        self.draw_page_number = theme.draw_page_number
+
+
+def page_story(pages, styles):
+    lines = [line for line in synthetic_lines(pages * 4) if line and not line.startswith(('#', '-', '*', '>'))]
+    story = []
+    for index in range(pages):
+        story.append(Paragraph(lines[index % len(lines)], styles['BodyText']))
+        story.append(PageBreak())
+    return story[:-1]
+
+
+def render(theme, styles, pages):
+    buffer = io.BytesIO()
+    doc = create_document(buffer, theme)
+    started = time.perf_counter()
+    build_document(doc, page_story(pages, styles), theme)
+    return time.perf_counter() - started, len(buffer.getvalue()), doc.page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3, help='best of N renders')
+    args = parser.parse_args()
+
+    print(f"{'theme':<20}{'pages':>6}{'per page':>12}{'form':>12}{'size':>8}"
+          f"{'per page':>12}{'form':>12}{'time':>8}  shared_chrome")
+    for theme_name in THEME_CLASSES:
+        theme = get_theme(theme_name)
+        styles = get_stylesheet(theme_name, 'left')
+        results = {}
+        for label, variant in (('per_page', PerPageChrome(theme)), ('form', SharedChrome(theme))):
+            runs = [render(variant, styles, args.pages) for _ in range(args.repeat)]
+            results[label] = (min(run[0] for run in runs), runs[0][1], runs[0][2])
+
+        old_time, old_size, pages = results['per_page']
+        new_time, new_size, _ = results['form']
+        print(f'{theme_name:<20}{pages:>6}{old_size / 1024:>10.0f}KB{new_size / 1024:>10.0f}KB'
+              f'{new_size / old_size:>7.0%} {old_time * 1000:>9.0f}ms{new_time * 1000:>10.0f}ms'
+              f'{new_time / old_time:>7.0%}  {shares_chrome(theme)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Parser Benchmark
+Measures parse_text throughput in lines per second
+
+Run from the repository root:
+    python -m benchmarks.parser [--sizes 1000 100000 1000000] [--repeat 3]
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import synthetic_text
+from utils.parser import parse_text
+
+IMAGES = ['image0.png', 'image1.png', 'image2.png']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs')
+    args = parser.parse_args()
+
+    print(f"{'lines':>10}{'blocks':>10}{'best (ms)':>12}{'lines/s':>14}")
+    for size in args.sizes:
+        text = synthetic_text(size, image_count=len(IMAGES))
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            blocks = parse_text(text, IMAGES)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'{size:>10}{len(blocks):>10}{best * 1000:>12.2f}{size / best:>14,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Stylesheet Benchmark
+Compares building theme styles per request with the shared stylesheet cache
+
+Run from the repository root:
+    python -m benchmarks.stylesheets [--iterations N]
+"""
+
+import argparse
+import time
+
+from utils.pdf_generator import ALIGNMENT_MAP, THEME_CLASSES, get_stylesheet, precompile_stylesheets
+
+
+def per_request_styles(theme_class, text_alignment):
+    """What generate_pdf used to do on every call"""
+    theme = theme_class()
+    styles = theme.get_styles()
+    styles['BodyText'].alignment = ALIGNMENT_MAP[text_alignment]
+    return styles
+
+
+def time_calls(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--alignment', default='justify', choices=sorted(ALIGNMENT_MAP))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    precompile_stylesheets()
+    print(f'precompile_stylesheets: {(time.perf_counter() - started) * 1000:.2f} ms '
+          f'for {len(THEME_CLASSES) * len(ALIGNMENT_MAP)} stylesheets\n')
+
+    print(f"{'theme':<20}{'per request (us)':>18}{'cached (us)':>14}{'speedup':>10}")
+    for theme_name, theme_class in THEME_CLASSES.items():
+        uncached = time_calls(lambda: per_request_styles(theme_class, args.alignment), args.iterations)
+        cached = time_calls(lambda: get_stylesheet(theme_name, args.alignment), args.iterations)
+        print(f'{theme_name:<20}{uncached * 1e6:>18.2f}{cached * 1e6:>14.3f}{uncached / cached:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark Suite
+Times parsing, story construction, layout and file write for every theme and output profile
+
+Run from the repository root:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --output new.json --compare results.json
+
+Each stage is timed separately (best of --repeat runs) for every theme in
+THEME_CLASSES, every document size and every --profiles output profile,
+and the PDF size is recorded alongside. With --compare, stages that got
+slower than the baseline by more than --threshold are flagged and the
+exit status is 1.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import reportlab
+
+from benchmarks.synthetic import synthetic_images, synthetic_text
+from utils import images as image_prep
+from utils.parser import parse_text
+from utils.pdf_generator import (
+    THEME_CLASSES, build_document, create_document, get_stylesheet, get_theme, iter_flowables
+)
+from utils.profiles import DEFAULT_PROFILE, PROFILES
+
+STAGES = ('parse', 'story', 'layout', 'write')
+
+
+def run_once(text, image_paths, theme_name, profile, output_path):
+    """Render one document with an output profile, returning per-stage seconds, page count and size"""
+    timings = {}
+
+    started = time.perf_counter()
+    parsed_content = parse_text(text, image_paths)
+    timings['parse'] = time.perf_counter() - started
+
+    theme = get_theme(theme_name)
+    styles = get_stylesheet(theme_name, 'justify')
+    started = time.perf_counter()
+    story = list(iter_flowables(parsed_content, styles, profile.image_dpi, profile))
+    timings['story'] = time.perf_counter() - started
+
+    buffer = io.BytesIO()
+    doc = create_document(buffer, theme, pageCompression=profile.compress)
+    started = time.perf_counter()
+    build_document(doc, story, theme)
+    timings['layout'] = time.perf_counter() - started
+
+    data = buffer.getvalue()
+    started = time.perf_counter()
+    with open(output_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    timings['write'] = time.perf_counter() - started
+
+    return timings, doc.page, len(data)
+
+
+def run_suite(sizes, themes, profiles, repeat, image_count, workdir):
+    image_prep.PREPARED_IMAGE_FOLDER = os.path.join(workdir, 'prepared')
+    image_paths = synthetic_images(os.path.join(workdir, 'images'), image_count)
+    results = []
+
+    for lines in sizes:
+        text = synthetic_text(lines, image_count=len(image_paths))
+        for theme_name in themes:
+            for profile_name in profiles:
+                best = {stage: None for stage in STAGES}
+                for _ in range(repeat):
+                    timings, pages, size = run_once(text, image_paths, theme_name, PROFILES[profile_name],
+                                                    os.path.join(workdir, 'out.pdf'))
+                    for stage, seconds in timings.items():
+                        if best[stage] is None or seconds < best[stage]:
+                            best[stage] = seconds
+                best['total'] = sum(best[stage] for stage in STAGES)
+                results.append({'theme': theme_name, 'lines': lines, 'profile': profile_name, 'pages': pages,
+                                'bytes': size, 'seconds': best})
+                print(f'{theme_name:<18}{profile_name:<10}{lines:>7} lines{pages:>6} pages{size / 1024:>9.0f}KB  ' +
+                      '  '.join(f'{stage} {best[stage] * 1000:8.1f}ms' for stage in STAGES + ('total',)))
+    return results
+
+
+def profile_summary(results):
+    """Print total render time and PDF size per output profile, summed over themes and sizes"""
+    totals = {}
+    for result in results:
+        seconds, size = totals.get(result['profile'], (0.0, 0))
+        totals[result['profile']] = (seconds + result['seconds']['total'], size + result['bytes'])
+    print(f"\n{'profile':<12}{'seconds':>10}{'KB':>10}")
+    for name, (seconds, size) in totals.items():
+        print(f'{name:<12}{seconds:>10.3f}{size / 1024:>10.0f}')
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """
+    Print per-stage ratios against a baseline; return the number of regressions
+
+    Stages that took less than min_seconds in the baseline are shown but not
+    gated, since their timings are mostly noise. Neither is write, which
+    measures the disk more than the renderer.
+    """
+    previous = {(r['theme'], r['lines'], r.get('profile', DEFAULT_PROFILE)): r for r in baseline['results']}
+    regressions = 0
+    print(f"\n{'theme':<18}{'profile':<10}{'lines':>7}  " + ''.join(f'{stage:>10}' for stage in STAGES + ('total',)))
+    for result in results:
+        old = previous.get((result['theme'], result['lines'], result['profile']))
+        if old is None:
+            continue
+        cells = []
+        for stage in STAGES + ('total',):
+            ratio = result['seconds'][stage] / max(old['seconds'][stage], 1e-9)
+            gated = stage != 'write' and old['seconds'][stage] >= min_seconds
+            flag = '!' if gated and ratio > 1 + threshold else ' '
+            if flag == '!':
+                regressions += 1
+            cells.append(f'{ratio:9.2f}{flag}')
+        print(f"{result['theme']:<18}{result['profile']:<10}{result['lines']:>7}  " + ''.join(cells))
+    print(f'\n{regressions} stage(s) slower than baseline by more than {threshold:.0%}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='VelvetDocs render benchmark suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help='document sizes in lines')
+    parser.add_argument('--themes', nargs='+', default=list(THEME_CLASSES), choices=list(THEME_CLASSES))
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs per stage')
+    parser.add_argument('--images', type=int, default=4, help='number of synthetic images')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file from a previous run')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before flagging')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='do not gate stages faster than this')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='velvetdocs-bench-') as workdir:
+        results = run_suite(args.sizes, args.themes, args.profiles, args.repeat, args.images, workdir)
+    profile_summary(results)
+
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'reportlab': reportlab.Version,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'images': args.images
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold, args.min_seconds):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
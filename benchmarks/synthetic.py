@@ -0,0 +1,109 @@
+"""
+Synthetic Documents
+Deterministic markdown-like input for the benchmarks
+"""
+
+import os
+import random
+
+from PIL import Image
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud '
+    'exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure '
+    'in reprehenderit voluptate velit esse cillum fugiat nulla pariatur excepteur sint '
+    'occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim id est'
+).split()
+
+
+def _sentence(rng, min_words=6, max_words=18):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    # Sprinkle inline formatting through the text
+    if len(words) > 4 and rng.random() < 0.4:
+        i = rng.randrange(len(words) - 2)
+        words[i] = f'**{words[i]} {words[i + 1]}**'
+        del words[i + 1]
+    if len(words) > 4 and rng.random() < 0.3:
+        i = rng.randrange(len(words))
+        if not words[i].startswith('**'):
+            words[i] = f'*{words[i]}*'
+    return ' '.join(words).capitalize() + '.'
+
+
+def synthetic_lines(line_count, image_count=0, seed=0):
+    """
+    Yield line_count lines mixing headings, paragraphs, lists, quotes and images
+
+    Image placeholders reference indices below image_count, so pass the
+    same number of image paths to parse_text.
+    """
+    rng = random.Random(seed)
+    produced = 0
+    section = 0
+
+    while produced < line_count:
+        roll = rng.random()
+        if roll < 0.05:
+            section += 1
+            block = [f'# Chapter {section}', '']
+        elif roll < 0.15:
+            block = [f'## {_sentence(rng, 2, 6)}', '']
+        elif roll < 0.22:
+            block = [f'### {_sentence(rng, 2, 5)}']
+        elif roll < 0.55:
+            sentences = rng.randint(2, 8) if rng.random() < 0.8 else rng.randint(15, 30)
+            block = [' '.join(_sentence(rng) for _ in range(sentences)), '']
+        elif roll < 0.72:
+            items = rng.randint(20, 60) if rng.random() < 0.1 else rng.randint(2, 12)
+            block = [f'{rng.choice("-*")} {_sentence(rng, 3, 12)}' for _ in range(items)]
+            block.append('')
+        elif roll < 0.80:
+            block = [f'> {_sentence(rng, 8, 30)}', '']
+        elif roll < 0.84 and image_count:
+            alignment = rng.choice(['center', 'left', 'right'])
+            block = [f'[IMG:{rng.randrange(image_count)}:{alignment}]', '']
+        else:
+            block = [_sentence(rng)]
+
+        for line in block:
+            if produced >= line_count:
+                return
+            yield line
+            produced += 1
+
+
+def synthetic_text(line_count, image_count=0, seed=0):
+    """Return synthetic_lines() joined into a single string"""
+    return '\n'.join(synthetic_lines(line_count, image_count, seed))
+
+
+def synthetic_paragraphs(paragraph_count, sentences, seed=0):
+    """
+    Return paragraph_count plain paragraphs of the given number of sentences each
+
+    For shapes synthetic_lines does not produce: very long paragraphs that
+    run over many pages, or thousands of one-sentence ones.
+    """
+    rng = random.Random(seed)
+    return '\n\n'.join(' '.join(_sentence(rng) for _ in range(sentences)) for _ in range(paragraph_count))
+
+
+def synthetic_images(folder, count, seed=0):
+    """
+    Write count test images to folder and return their paths
+
+    Sizes range from a small PNG diagram to a 12 megapixel JPEG photo, so
+    both the pass-through and the downsampling paths are exercised.
+    """
+    rng = random.Random(seed)
+    sizes = [(640, 480, 'png'), (1600, 1200, 'jpg'), (4000, 3000, 'jpg'), (1200, 800, 'png')]
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for index in range(count):
+        width, height, ext = sizes[index % len(sizes)]
+        img = Image.effect_noise((width, height), 40 + rng.randrange(40)).convert('RGB')
+        path = os.path.join(folder, f'synthetic_{index}_{width}x{height}.{ext}')
+        img.save(path)
+        paths.append(path)
+    return paths
@@ -31,6 +31,9 @@ class AcademicTheme:
             'left': 1.0 * inch,
             'right': 1.0 * inch
         }
+        
+        # A single rule: as a form it made benchmarks.page_chrome's PDF 6% larger
+        self.shared_chrome = False
     
     def get_styles(self):
         """Return dictionary of paragraph styles for this theme"""
@@ -112,18 +115,13 @@ class AcademicTheme:
     
     def add_page_decorations(self, canvas, doc, page_num):
         """Add header, footer, and page decorations"""
+        self.draw_page_chrome(canvas, doc)
+        self.draw_page_number(canvas, doc, page_num)
+    
+    def draw_page_chrome(self, canvas, doc):
+        """Draw the decorations that are identical on every page"""
         canvas.saveState()
         
-        # Footer with page number
-        footer_text = f"Page {page_num}"
-        canvas.setFont('Times-Roman', 10)
-        canvas.setFillColor(self.colors['accent'])
-        canvas.drawCentredString(
-            doc.width / 2 + doc.leftMargin,
-            0.5 * inch,
-            footer_text
-        )
-        
         # Top border line
         canvas.setStrokeColor(self.colors['accent'])
         canvas.setLineWidth(0.5)
@@ -135,3 +133,19 @@ class AcademicTheme:
         )
         
         canvas.restoreState()
+    
+    def draw_page_number(self, canvas, doc, page_num):
+        """Draw the page number footer"""
+        canvas.saveState()
+        
+        # Footer with page number
+        footer_text = f"Page {page_num}"
+        canvas.setFont('Times-Roman', 10)
+        canvas.setFillColor(self.colors['accent'])
+        canvas.drawCentredString(
+            doc.width / 2 + doc.leftMargin,
+            0.5 * inch,
+            footer_text
+        )
+        
+        canvas.restoreState()
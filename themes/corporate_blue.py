@@ -114,6 +114,11 @@ class CorporateBlueTheme:
     
     def add_page_decorations(self, canvas, doc, page_num):
         """Add corporate header and footer"""
+        self.draw_page_chrome(canvas, doc)
+        self.draw_page_number(canvas, doc, page_num)
+    
+    def draw_page_chrome(self, canvas, doc):
+        """Draw the decorations that are identical on every page"""
         canvas.saveState()
         
         # Corporate header bar
@@ -148,15 +153,6 @@ class CorporateBlueTheme:
             0.7 * inch
         )
         
-        # Page number
-        canvas.setFont('Helvetica', 9)
-        canvas.setFillColor(self.colors['secondary'])
-        canvas.drawRightString(
-            doc.width + doc.leftMargin,
-            0.5 * inch,
-            f"Page {page_num}"
-        )
-        
         # Company watermark (optional)
         canvas.setFont('Helvetica-Bold', 10)
         canvas.setFillColor(self.colors['accent'])
@@ -167,3 +163,18 @@ class CorporateBlueTheme:
         )
         
         canvas.restoreState()
+    
+    def draw_page_number(self, canvas, doc, page_num):
+        """Draw the page number footer"""
+        canvas.saveState()
+        
+        # Page number
+        canvas.setFont('Helvetica', 9)
+        canvas.setFillColor(self.colors['secondary'])
+        canvas.drawRightString(
+            doc.width + doc.leftMargin,
+            0.5 * inch,
+            f"Page {page_num}"
+        )
+        
+        canvas.restoreState()
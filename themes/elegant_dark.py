@@ -112,6 +112,11 @@ class ElegantDarkTheme:
     
     def add_page_decorations(self, canvas, doc, page_num):
         """Add elegant dark decorations with gold accents"""
+        self.draw_page_chrome(canvas, doc)
+        self.draw_page_number(canvas, doc, page_num)
+    
+    def draw_page_chrome(self, canvas, doc):
+        """Draw the decorations that are identical on every page"""
         canvas.saveState()
         
         # Fill entire page with dark background
@@ -139,6 +144,12 @@ class ElegantDarkTheme:
         canvas.line(doc.width + doc.leftMargin + 0.2 * inch, doc.height + doc.bottomMargin + 0.3 * inch,
                    doc.width + doc.leftMargin + 0.2 * inch, doc.height + doc.bottomMargin - 0.4 * inch)
         
+        canvas.restoreState()
+    
+    def draw_page_number(self, canvas, doc, page_num):
+        """Draw the page number footer"""
+        canvas.saveState()
+        
         # Footer with elegant page number
         canvas.setFont('Times-Roman', 10)
         canvas.setFillColor(self.colors['primary'])
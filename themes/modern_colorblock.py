@@ -112,6 +112,11 @@ class ModernColorblockTheme:
     
     def add_page_decorations(self, canvas, doc, page_num):
         """Add colorful modern decorations"""
+        self.draw_page_chrome(canvas, doc)
+        self.draw_page_number(canvas, doc, page_num)
+    
+    def draw_page_chrome(self, canvas, doc):
+        """Draw the decorations that are identical on every page"""
         canvas.saveState()
         
         # Top color block (gradient effect with multiple bars)
@@ -140,6 +145,12 @@ class ModernColorblockTheme:
             stroke=False
         )
         
+        canvas.restoreState()
+    
+    def draw_page_number(self, canvas, doc, page_num):
+        """Draw the page number footer"""
+        canvas.saveState()
+        
         # Footer with colorful page number
         canvas.setFont('Helvetica-Bold', 10)
         canvas.setFillColor(self.colors['secondary'])
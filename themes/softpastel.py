@@ -112,6 +112,11 @@ class SoftPastelTheme:
     
     def add_page_decorations(self, canvas, doc, page_num):
         """Add minimal decorations with pastel accents"""
+        self.draw_page_chrome(canvas, doc)
+        self.draw_page_number(canvas, doc, page_num)
+    
+    def draw_page_chrome(self, canvas, doc):
+        """Draw the decorations that are identical on every page"""
         canvas.saveState()
         
         # Subtle background tint
@@ -137,6 +142,12 @@ class SoftPastelTheme:
                 stroke=False
             )
         
+        canvas.restoreState()
+    
+    def draw_page_number(self, canvas, doc, page_num):
+        """Draw the page number footer"""
+        canvas.saveState()
+        
         # Minimal footer - just page number, no lines
         canvas.setFont('Helvetica', 9)
         canvas.setFillColor(self.colors['primary'])
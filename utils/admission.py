@@ -0,0 +1,233 @@
+"""
+Admission Control Module
+Decides when (or whether) a render may run, given its estimated cost
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class Rejected(Exception):
+    """Raised when a render cannot be admitted; retry_after is in whole seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    A render slot returned by admit() or reserve()
+
+    Release it (or leave the with block) once the render ends; releasing a
+    reserved ticket that is still queued withdraws it.
+    """
+
+    def __init__(self, controller, lane, client, cost):
+        self.controller = controller
+        self.lane = lane
+        self.client = client
+        self.cost = cost
+        self.granted = False
+        self.released = False
+        self.on_granted = None
+
+    def when_granted(self, callback):
+        """Call callback(ticket) once the ticket holds a slot: now if it already does, else from release()"""
+        with self.controller._condition:
+            if not self.granted:
+                self.on_granted = callback
+                return
+        callback(self)
+
+    def release(self):
+        self.controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class Lane:
+    """Render slots for one class of work, with waiting tickets queued per client"""
+
+    def __init__(self, name, slots, max_queue):
+        self.name = name
+        self.slots = slots
+        self.max_queue = max_queue
+        self.running = 0
+        self.running_cost = 0.0
+        self.waiting = OrderedDict()  # client -> deque of tickets, in round-robin order
+        self.queued = 0
+        self.queued_cost = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def next_ticket(self, deferred=()):
+        """Take the oldest ticket of the next client in turn, passing over deferred clients while others wait"""
+        client = next((client for client in self.waiting if client not in deferred), None)
+        if client is None:
+            client = next(iter(self.waiting))
+        tickets = self.waiting[client]
+        ticket = tickets.popleft()
+        if tickets:
+            self.waiting.move_to_end(client)
+        else:
+            del self.waiting[client]
+        return ticket
+
+    def retry_after(self):
+        """Seconds until the work ahead of a new arrival should have drained"""
+        backlog = (self.running_cost + self.queued_cost) / max(1, self.slots)
+        return max(1, math.ceil(backlog))
+
+
+class AdmissionController:
+    """
+    Routes renders to a fast or a heavy lane by their estimated cost
+
+    Renders estimated below fast_cost seconds use the fast lane, everything
+    else the heavy lane, so a flood of large documents cannot hold up small
+    interactive ones. Each lane runs at most `slots` renders at once and
+    queues at most `max_queue` more; beyond that, and after waiting
+    max_wait seconds, admit() raises Rejected. Waiting tickets are granted
+    round-robin across clients, and a client already running client_limit
+    renders is passed over while other clients wait, so one tenant cannot
+    monopolise the renderers. It is not refused, though: when nobody else
+    is waiting its renders still get the free slots, so many users behind
+    one address are never capped at client_limit.
+    """
+
+    def __init__(self, fast_slots, heavy_slots, fast_queue=64, heavy_queue=16, fast_cost=0.5,
+                 client_limit=4, max_wait=30):
+        self.fast_cost = fast_cost
+        self.client_limit = client_limit
+        self.max_wait = max_wait
+        self.lanes = {
+            'fast': Lane('fast', fast_slots, fast_queue),
+            'heavy': Lane('heavy', heavy_slots, heavy_queue)
+        }
+        self._clients = {}  # client -> tickets held or waiting
+        self._running = {}  # client -> tickets holding a slot
+        self._condition = threading.Condition()
+
+    def lane_for(self, cost):
+        return self.lanes['fast' if cost < self.fast_cost else 'heavy']
+
+    def admit(self, client, cost):
+        """Wait for a slot for a render of the given cost; returns a Ticket"""
+        with self._condition:
+            ticket = self._enqueue(client, cost)
+            if ticket.granted:
+                return ticket
+            lane = ticket.lane
+            deadline = time.monotonic() + self.max_wait
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._withdraw(ticket)
+                    lane.rejected += 1
+                    raise Rejected(f'Timed out waiting for the {lane.name} render queue', lane.retry_after())
+                self._condition.wait(remaining)
+            return ticket
+
+    def reserve(self, client, cost):
+        """
+        Take a slot, or a place in the lane's queue, without waiting; returns a Ticket
+
+        For background jobs: raises Rejected straight away if the queue is
+        full, and otherwise leaves it to Ticket.when_granted to start the
+        render once a slot frees up. Reserved tickets wait without a deadline.
+        """
+        with self._condition:
+            return self._enqueue(client, cost)
+
+    def _enqueue(self, client, cost):
+        """Start a new ticket or queue it, raising Rejected if it cannot be (caller holds the lock)"""
+        lane = self.lane_for(cost)
+        ticket = Ticket(self, lane, client, cost)
+        must_wait = lane.running >= lane.slots or bool(lane.waiting)
+        if must_wait and lane.queued >= lane.max_queue:
+            lane.rejected += 1
+            raise Rejected(f'The {lane.name} render queue is full', lane.retry_after())
+        self._clients[client] = self._clients.get(client, 0) + 1
+        if must_wait:
+            lane.waiting.setdefault(client, deque()).append(ticket)
+            lane.queued += 1
+            lane.queued_cost += cost
+        else:
+            self._start(ticket)
+        return ticket
+
+    def _start(self, ticket):
+        """Give a ticket one of its lane's slots (caller holds the lock)"""
+        lane = ticket.lane
+        ticket.granted = True
+        self._running[ticket.client] = self._running.get(ticket.client, 0) + 1
+        lane.running += 1
+        lane.running_cost += ticket.cost
+        lane.admitted += 1
+
+    def _withdraw(self, ticket):
+        """Remove a waiting ticket that gave up (caller holds the lock)"""
+        lane = ticket.lane
+        tickets = lane.waiting.get(ticket.client)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del lane.waiting[ticket.client]
+            lane.queued -= 1
+            lane.queued_cost -= ticket.cost
+        self._drop_client(ticket.client)
+
+    def _drop_client(self, client):
+        count = self._clients.get(client, 0) - 1
+        if count > 0:
+            self._clients[client] = count
+        else:
+            self._clients.pop(client, None)
+
+    def _release(self, ticket):
+        started = []
+        with self._condition:
+            if ticket.released:
+                return
+            ticket.released = True
+            if not ticket.granted:
+                self._withdraw(ticket)
+                return
+            lane = ticket.lane
+            lane.running -= 1
+            lane.running_cost -= ticket.cost
+            self._drop_client(ticket.client)
+            running = self._running[ticket.client] - 1
+            if running:
+                self._running[ticket.client] = running
+            else:
+                del self._running[ticket.client]
+            while lane.waiting and lane.running < lane.slots:
+                at_limit = {client for client, count in self._running.items() if count >= self.client_limit}
+                waiting = lane.next_ticket(at_limit)
+                lane.queued -= 1
+                lane.queued_cost -= waiting.cost
+                self._start(waiting)
+                started.append(waiting)
+            self._condition.notify_all()
+        # Reserved tickets start their renders outside the lock
+        for waiting in started:
+            if waiting.on_granted is not None:
+                waiting.on_granted(waiting)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'clients': len(self._clients),
+                'lanes': {name: {'slots': lane.slots, 'running': lane.running, 'queued': lane.queued,
+                                 'max_queue': lane.max_queue, 'admitted': lane.admitted, 'rejected': lane.rejected}
+                          for name, lane in self.lanes.items()}
+            }
@@ -0,0 +1,172 @@
+"""
+ASGI Adapter Module
+Serves the Flask app from an asyncio server without a thread per waiting client
+"""
+
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Request bodies above this are spooled to a temporary file instead of memory
+SPOOL_MAX_SIZE = 1024 * 1024
+
+_END = object()
+_TOO_LARGE = object()
+
+
+class AsgiAdapter:
+    """
+    Run a WSGI app behind an ASGI server
+
+    The request body is received on the event loop and spooled to a
+    temporary file (large uploads spill to disk, written off the loop), so
+    slow uploads only cost a little memory, not a thread. Once the whole
+    body is in, the WSGI app runs on a bounded pool of max_threads threads
+    and its response is streamed back chunk by chunk. Bodies larger than
+    max_body are refused with 413: before they are read when they declare
+    a Content-Length, and as soon as they pass it otherwise (chunked).
+    """
+
+    def __init__(self, wsgi_app, max_threads=32, spool_max_size=SPOOL_MAX_SIZE, max_body=None):
+        self.wsgi_app = wsgi_app
+        self.spool_max_size = spool_max_size
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        headers = [(name.decode('latin-1').lower(), value.decode('latin-1')) for name, value in scope['headers']]
+        declared = next((value for name, value in headers if name == 'content-length'), None)
+        if self.max_body is not None and declared is not None and declared.isdigit() \
+                and int(declared) > self.max_body:
+            await _send_simple(send, 413, b'Request body too large')
+            return
+
+        body = await self._receive_body(receive)
+        if body is None:
+            return  # client went away
+        if body is _TOO_LARGE:
+            await _send_simple(send, 413, b'Request body too large')
+            return
+        try:
+            await self._run_wsgi(scope, headers, body, send)
+        finally:
+            body.close()
+
+    async def _receive_body(self, receive):
+        """Spool the request body; returns the rewound file, None on disconnect or _TOO_LARGE past max_body"""
+        loop = asyncio.get_running_loop()
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_max_size)
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            chunk = message.get('body', b'')
+            more = message.get('more_body', False)
+            if not chunk:
+                continue
+            size += len(chunk)
+            if self.max_body is not None and size > self.max_body:
+                body.close()
+                return _TOO_LARGE
+            if size > self.spool_max_size:
+                # Past the spool size every write goes to disk; keep it off the loop
+                await loop.run_in_executor(self.executor, body.write, chunk)
+            else:
+                body.write(chunk)
+        body.seek(0)
+        return body
+
+    async def _run_wsgi(self, scope, headers, body, send):
+        loop = asyncio.get_running_loop()
+        environ = _environ(scope, headers, body)
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in response_headers]
+
+        iterable = await loop.run_in_executor(self.executor, self.wsgi_app, environ, start_response)
+        try:
+            iterator = iter(iterable)
+            # Generators may call start_response on their first step
+            chunk = await loop.run_in_executor(self.executor, next, iterator, _END)
+            await send({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+            response['sent'] = True
+            while chunk is not _END:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, next, iterator, _END)
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+
+def _environ(scope, headers, body):
+    """Build the WSGI environ for an ASGI http scope whose body is already spooled"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    body.seek(0, 2)
+    length = body.tell()
+    body.seek(0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in headers:
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _send_simple(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain'), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
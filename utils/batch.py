@@ -0,0 +1,59 @@
+"""
+Batch Output Module
+Streams many rendered PDFs back as a single ZIP archive
+"""
+
+import json
+import zipfile
+
+# Size of the pieces read from each PDF while it is added to the archive
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipSink:
+    """Write-only buffer that zipfile treats as an unseekable stream"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries, manifest=None):
+    """
+    Yield a ZIP archive piece by piece
+
+    entries is an iterable of (arcname, path or binary file) pairs and may be lazy (for example,
+    a generator that waits for each render to finish), so the client starts
+    receiving data as soon as the first PDF is ready. PDFs are already
+    compressed, so they are stored rather than deflated. If manifest is given
+    it is called once all entries are written and its result is added as
+    manifest.json. File objects are closed once they have been copied.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, source in entries:
+            source = open(source, 'rb') if isinstance(source, str) else source
+            with source as src, archive.open(arcname, 'w') as dest:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+
+        if manifest is not None:
+            archive.writestr('manifest.json', json.dumps(manifest(), indent=2))
+    yield sink.drain()
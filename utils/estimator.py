@@ -0,0 +1,218 @@
+"""
+Render Estimator Module
+Predicts page count and render time from parsed content, before doc.build runs
+"""
+
+import math
+import re
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from utils.images import image_size
+from utils.pdf_generator import BLOCK_SPACING, get_stylesheet, get_theme, image_display_size
+
+# Render time model: seconds per page, flowable, character, wrapped line,
+# split line, pixel of each distinct image and image placement, scaled by
+# a per-theme factor. Fitted by `python -m benchmarks.estimator --fit`
+# against real renders. A paragraph that runs over a page is broken into
+# lines again for what is left of it on every page, so its cost grows with
+# lines x pages spanned ("split lines"), not just its length. The
+# benchmark prepares its images before timing, so resampling a fresh
+# upload is not in the fit: first renders with large new images run
+# longer than estimated.
+BASE_SECONDS = 0.0
+PAGE_SECONDS = 0.0
+BLOCK_SECONDS = 0.0
+CHAR_SECONDS = 0.00000781
+LINE_SECONDS = 0.000315
+SPLIT_LINE_SECONDS = 0.000436
+PIXEL_SECONDS = 0.0
+IMAGE_SECONDS = 0.282
+
+# How much slower than the fitted model each theme lays out; other themes use 1
+THEME_FACTORS = {
+    'academic': 1.06,
+    'corporate_blue': 1.08,
+    'elegant_dark': 1.07,
+    'modern_colorblock': 1.10,
+    'research_pro': 1.10,
+    'softpastel': 1.06
+}
+
+# Share of each line that wrapped text fills on average, also fitted by the benchmark
+LINE_FILL = 0.95
+
+# Space ReportLab's default frame keeps inside the margins, on every side
+FRAME_PADDING = 6
+
+# Block types drawn as one paragraph in a style, and that style
+PARAGRAPH_STYLES = {
+    'h1': 'Heading1',
+    'h2': 'Heading2',
+    'h3': 'Heading3',
+    'paragraph': 'BodyText',
+    'blockquote': 'Blockquote'
+}
+
+# Inline markup characters that take no width once rendered
+_MARKUP = re.compile(r'\*+')
+
+# Used when only the size of a document is known
+CHARS_PER_BLOCK = 80
+CHARS_PER_LINE = 90
+CHARS_PER_PAGE = 3000
+
+
+class Estimate:
+    """Predicted pages and seconds for one render, with the counts they came from"""
+
+    __slots__ = ('pages', 'seconds', 'blocks', 'characters', 'image_pixels', 'images', 'lines', 'split_lines')
+
+    def __init__(self, pages, seconds, blocks, characters, image_pixels, images=0, lines=0, split_lines=0):
+        self.pages = pages
+        self.seconds = seconds
+        self.blocks = blocks
+        self.characters = characters
+        self.image_pixels = image_pixels
+        self.images = images
+        self.lines = lines
+        self.split_lines = split_lines
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def estimate_seconds(pages, blocks, characters, image_pixels=0, images=0, theme_name=None, lines=0,
+                     split_lines=0):
+    """
+    Render time in seconds predicted for the given counts
+
+    image_pixels counts each distinct image once (it is prepared and embedded
+    once per render), images counts every placement. lines are wrapped text
+    lines, and split_lines each paragraph's lines times the pages it spans.
+    """
+    seconds = (BASE_SECONDS + pages * PAGE_SECONDS + blocks * BLOCK_SECONDS + characters * CHAR_SECONDS
+               + lines * LINE_SECONDS + split_lines * SPLIT_LINE_SECONDS
+               + image_pixels * PIXEL_SECONDS + images * IMAGE_SECONDS)
+    return seconds * THEME_FACTORS.get(theme_name, 1.0)
+
+
+def estimate_size(size, image_paths=()):
+    """Rough estimate for size characters of text that has not been parsed"""
+    pixels = sum(_pixels(path, {}) for path in set(image_paths))
+    pages = max(1, math.ceil(size / CHARS_PER_PAGE))
+    blocks = size / CHARS_PER_BLOCK
+    lines = size / CHARS_PER_LINE
+    seconds = estimate_seconds(pages, blocks, size, pixels, len(image_paths), lines=lines)
+    return Estimate(pages, seconds, int(blocks), size, pixels, len(image_paths), int(lines))
+
+
+def admission_seconds(estimate, size, image_paths=()):
+    """
+    Seconds to admit a render by: its estimate, but never less than size characters alone predict
+
+    The size-based floor keeps text-heavy input out of the fast lane even
+    where the layout estimate falls short of it.
+    """
+    return max(estimate.seconds, estimate_size(size, image_paths).seconds)
+
+
+def _pixels(path, sizes):
+    if path not in sizes:
+        try:
+            width, height = image_size(path)
+            sizes[path] = (width, height)
+        except OSError:
+            sizes[path] = None
+    size = sizes[path]
+    return size[0] * size[1] if size else 0
+
+
+class _PageFiller:
+    """Stacks block heights into frames the way the layout does, counting pages"""
+
+    def __init__(self, frame_height):
+        self.frame_height = frame_height
+        self.pages = 1
+        self.used = 0.0
+
+    def add(self, height, splittable=True):
+        if self.used + height <= self.frame_height:
+            self.used += height
+        elif splittable:
+            self.used += height
+            while self.used > self.frame_height:
+                self.pages += 1
+                self.used -= self.frame_height
+        else:
+            self.pages += 1
+            self.used = min(height, self.frame_height)
+
+    def space(self, height):
+        """Spacing that does not fit is dropped at the bottom of a page"""
+        if self.used + height <= self.frame_height:
+            self.used += height
+
+
+def _paragraph_lines(text, style, frame_width):
+    """Number of lines text wraps to in style, and the height they take"""
+    width = stringWidth(_MARKUP.sub('', text), style.fontName, style.fontSize)
+    available = (frame_width - style.leftIndent - style.rightIndent) * LINE_FILL
+    lines = max(1, math.ceil(width / available)) if available > 0 else 1
+    return lines, style.spaceBefore + lines * style.leading + style.spaceAfter
+
+
+def estimate_render(parsed_content, theme_name, text_alignment='left'):
+    """
+    Predict the pages and render seconds of a render, without laying it out
+
+    parsed_content is parse_text (or iter_blocks) output; it is read once,
+    so a streamed parse works too. Text heights come from real font metrics
+    of the theme's styles, wrapped at the frame width its margins leave;
+    images use the size they will be drawn at.
+    """
+    theme = get_theme(theme_name)
+    styles = get_stylesheet(theme_name, text_alignment)
+    page_width, page_height = letter
+    frame_width = page_width - theme.margins['left'] - theme.margins['right'] - 2 * FRAME_PADDING
+    frame_height = page_height - theme.margins['top'] - theme.margins['bottom'] - 2 * FRAME_PADDING
+
+    filler = _PageFiller(frame_height)
+    blocks = characters = images = lines = 0
+    split_lines = 0.0
+    sizes = {}
+
+    for block in parsed_content:
+        block_type = block['type']
+        blocks += 1
+        if block_type in PARAGRAPH_STYLES:
+            text = block['content']
+            characters += len(text)
+            count, height = _paragraph_lines(text, styles[PARAGRAPH_STYLES[block_type]], frame_width)
+            lines += count
+            split_lines += count * height / frame_height
+            filler.add(height, splittable=block_type == 'paragraph')
+            filler.space(BLOCK_SPACING[block_type])
+        elif block_type == 'list':
+            for item in block['items']:
+                characters += len(item)
+                count, height = _paragraph_lines(f'• {item}', styles['List'], frame_width)
+                lines += count
+                split_lines += count * height / frame_height
+                filler.add(height)
+            blocks += len(block['items']) - 1
+            filler.space(BLOCK_SPACING['list'])
+        elif block_type == 'image':
+            images += 1
+            _pixels(block['path'], sizes)
+            size = sizes[block['path']]
+            if size:
+                filler.add(image_display_size(*size)[1], splittable=False)
+                filler.space(BLOCK_SPACING['image'])
+        elif block_type == 'space':
+            filler.space(BLOCK_SPACING['space'])
+
+    pixels = sum(_pixels(path, sizes) for path in sizes)
+    seconds = estimate_seconds(filler.pages, blocks, characters, pixels, images, theme_name, lines, split_lines)
+    return Estimate(filler.pages, seconds, blocks, characters, pixels, images, lines, round(split_lines))
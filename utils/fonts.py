@@ -0,0 +1,167 @@
+"""
+Font Registry Module
+Registers TrueType font families once per process so themes can use them by name
+"""
+
+import os
+import threading
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+from reportlab.lib.fonts import addMapping
+
+# Where TTF files are looked for, named <Family>-<Face>.ttf (e.g. Inter-BoldItalic.ttf)
+FONT_FOLDER = 'fonts'
+
+# Faces a family can have, and the suffix of their registered font names
+FACES = {
+    'regular': '',
+    'bold': '-Bold',
+    'italic': '-Italic',
+    'bolditalic': '-BoldItalic'
+}
+
+# File name suffixes accepted for each face
+_FACE_ALIASES = {
+    '': 'regular',
+    'regular': 'regular',
+    'bold': 'bold',
+    'italic': 'italic',
+    'oblique': 'italic',
+    'regularitalic': 'italic',
+    'bolditalic': 'bolditalic',
+    'boldoblique': 'bolditalic'
+}
+
+# Base-14 stand-ins used when a family is not installed
+FALLBACK_FONTS = {
+    'regular': 'Helvetica',
+    'bold': 'Helvetica-Bold',
+    'italic': 'Helvetica-Oblique',
+    'bolditalic': 'Helvetica-BoldOblique'
+}
+
+_index = None  # family -> {face: path}, built on first use
+_registered = {}  # family -> {face: registered font name}
+_lock = threading.RLock()
+
+
+def _split_face(stem):
+    """'Inter-BoldItalic' -> ('Inter', 'bolditalic'); unknown suffixes stay in the family"""
+    if '-' in stem:
+        family, suffix = stem.rsplit('-', 1)
+        face = _FACE_ALIASES.get(suffix.lower())
+        if face is not None:
+            return family, face
+    return stem, 'regular'
+
+
+def scan_fonts(folder=None):
+    """Index the TTF files in folder (FONT_FOLDER by default) without loading them"""
+    global _index
+    folder = folder or FONT_FOLDER
+    index = {}
+    if os.path.isdir(folder):
+        for root, _, filenames in os.walk(folder):
+            for filename in sorted(filenames):
+                stem, ext = os.path.splitext(filename)
+                if ext.lower() != '.ttf':
+                    continue
+                family, face = _split_face(stem)
+                index.setdefault(family, {}).setdefault(face, os.path.join(root, filename))
+    with _lock:
+        _index = index
+    return index
+
+
+def available_families():
+    """Names of the font families found in the font folder"""
+    with _lock:
+        index = _index if _index is not None else scan_fonts()
+    return sorted(index)
+
+
+def register_family(family):
+    """
+    Load and register every face of family, once per process
+
+    Returns {face: registered font name}, or None if the family is not
+    installed. Missing faces borrow the closest one that exists, and the
+    family mapping is registered so <b> and <i> in paragraphs switch faces.
+    ReportLab embeds TTFs as subsets, so only the glyphs a PDF actually uses
+    end up in it.
+    """
+    registered = _registered.get(family)
+    if registered is not None:
+        return registered
+
+    with _lock:
+        if family in _registered:
+            return _registered[family]
+        index = _index if _index is not None else scan_fonts()
+        paths = index.get(family)
+        if not paths:
+            return None
+
+        loaded = {}
+        for face, suffix in FACES.items():
+            path = paths.get(face)
+            if path is None:
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(family + suffix, path))
+            except (TTFError, OSError):
+                continue
+            loaded[face] = family + suffix
+        if not loaded:
+            return None
+
+        # Missing faces borrow one that exists (bold italic prefers bold, then italic)
+        names = dict(loaded)
+        regular = names.setdefault('regular', next(iter(loaded.values())))
+        names.setdefault('bold', regular)
+        names.setdefault('italic', regular)
+        names.setdefault('bolditalic', loaded.get('bold') or loaded.get('italic') or regular)
+
+        pdfmetrics.registerFontFamily(family, normal=names['regular'], bold=names['bold'],
+                                      italic=names['italic'], boldItalic=names['bolditalic'])
+        # Borrowed faces must not change what a real face's name maps back to
+        for face, name in loaded.items():
+            addMapping(family, 'bold' in face, 'italic' in face, name)
+        _registered[family] = names
+        return names
+
+
+def resolve_font(font_name):
+    """
+    Return the registered font name to use for font_name
+
+    font_name is a base-14 name ('Helvetica-Bold'), an installed family
+    ('Inter') or a family and face ('Inter-BoldItalic'). Families that are
+    not installed fall back to the matching Helvetica face, so a theme that
+    asks for a brand font still renders without it.
+    """
+    if font_name in pdfmetrics.standardFonts:
+        return font_name
+
+    names = register_family(font_name)
+    if names is not None:
+        return names['regular']
+
+    family, face = _split_face(font_name)
+    names = register_family(family) if family != font_name else None
+    if names is not None:
+        return names[face]
+    return FALLBACK_FONTS[face]
+
+
+def preload_fonts():
+    """
+    Register every installed family now
+
+    Called at startup so requests never pay for parsing a TTF, and so
+    forked worker processes inherit the loaded fonts.
+    """
+    for family in available_families():
+        register_family(family)
+    return {family: dict(names) for family, names in _registered.items()}
@@ -0,0 +1,92 @@
+"""
+Image Store Module
+Content-addressed storage for uploaded images with reference counting
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+
+from utils.storage import shard_path
+
+# Size of the chunks copied (and hashed) while saving an upload
+CHUNK_SIZE = 64 * 1024
+
+# Stored images are named <digest>.<ext>, in hash-prefixed subfolders
+DIGEST_LENGTH = 32
+
+
+class ImageStore:
+    """
+    Keeps one copy of each distinct uploaded image
+
+    Uploads are hashed while they are copied to disk, so identical images
+    (whatever they were called) end up as the same file. Renders hold a
+    reference to every image they use; the retention sweeper leaves
+    referenced images alone. Reference counts are per process, so under
+    several app workers they only pin an image against this process's
+    sweeper. Every reuse also refreshes the file's mtime, and each sweeper
+    checks the mtime before removing an expired file, so another worker
+    keeps it for ttl seconds after its last reuse.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._refs = {}  # path -> number of renders using it
+        self._lock = threading.Lock()
+
+    def save(self, file, filename):
+        """
+        Store an uploaded file and take a reference to it
+
+        file is a werkzeug FileStorage (or anything with a binary .stream);
+        filename is the sanitised upload name, used only for its extension.
+        Returns the stored path.
+        """
+        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+        digest = hashlib.sha256()
+        temp_path = os.path.join(self.folder, f'.{uuid.uuid4().hex}.upload')
+
+        try:
+            with open(temp_path, 'wb') as out:
+                for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            path = shard_path(self.folder, f'{digest.hexdigest()[:DIGEST_LENGTH]}.{ext}')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._lock:
+                try:
+                    # Reused: restart the retention clock other processes read from the mtime
+                    os.utime(path)
+                    os.remove(temp_path)
+                except FileNotFoundError:
+                    os.replace(temp_path, path)
+                self._refs[path] = self._refs.get(path, 0) + 1
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return path
+
+    def release(self, paths):
+        """Drop one reference to each of the given stored paths"""
+        with self._lock:
+            for path in paths:
+                count = self._refs.get(path, 0) - 1
+                if count > 0:
+                    self._refs[path] = count
+                else:
+                    self._refs.pop(path, None)
+
+    def is_referenced(self, path):
+        """True while some render still needs the image at path"""
+        with self._lock:
+            return path in self._refs
+
+    def stats(self):
+        with self._lock:
+            return {
+                'referenced_images': len(self._refs),
+                'references': sum(self._refs.values())
+            }
@@ -0,0 +1,163 @@
+"""
+Image Preparation Module
+Resamples images to the output resolution before they are embedded in a PDF
+"""
+
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+# Where prepared images are written (shared by all worker processes)
+PREPARED_IMAGE_FOLDER = 'prepared_images'
+
+# Output resolution used when none is requested
+DEFAULT_DPI = 150
+
+# JPEG quality for re-encoded photos
+JPEG_QUALITY = 85
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+_EXIF_ORIENTATION = 0x0112
+
+# content key -> prepared path, most recently used last
+_prepared = OrderedDict()
+_prepared_lock = threading.Lock()
+_PREPARED_INDEX_SIZE = 4096
+
+
+def _orientation(pil_img):
+    try:
+        return pil_img.getexif().get(_EXIF_ORIENTATION, 1)
+    except Exception:
+        return 1
+
+
+def image_size(path):
+    """Return the (width, height) of an image in pixels as it will be displayed"""
+    with PILImage.open(path) as pil_img:
+        width, height = pil_img.size
+        if _orientation(pil_img) in _TRANSPOSED_ORIENTATIONS:
+            return height, width
+        return width, height
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prepare_image(path, width, height, dpi=DEFAULT_DPI, cache_folder=None, quality=JPEG_QUALITY,
+                  photos_as_jpeg=False, grayscale=False, originals=False):
+    """
+    Return the path of an image suitable for embedding at width x height points
+
+    Images larger than the target resolution are downsampled (JPEGs are decoded
+    in draft mode at a reduced scale first) and EXIF orientation is applied.
+    Re-encoded JPEGs use the given quality; photos_as_jpeg also re-encodes
+    photographic PNGs as JPEG, grayscale drops colour, and originals keeps
+    full resolution (only the orientation is fixed). Results are cached on
+    disk by content hash, size, dpi and these options, so repeated renders
+    reuse them. If nothing needs to change, or preparation fails, the
+    original path is returned.
+    """
+    cache_folder = cache_folder or PREPARED_IMAGE_FOLDER
+    target_width = max(1, math.ceil(width / 72 * dpi))
+    target_height = max(1, math.ceil(height / 72 * dpi))
+    options = (quality, photos_as_jpeg, grayscale, originals)
+
+    try:
+        key = f'{_file_digest(path)[:32]}_{target_width}x{target_height}'
+        if options != (JPEG_QUALITY, False, False, False):
+            key += f"_q{quality}{'j' if photos_as_jpeg else ''}{'g' if grayscale else ''}{'o' if originals else ''}"
+        with _prepared_lock:
+            prepared_path = _prepared.get(key)
+            if prepared_path is not None:
+                _prepared.move_to_end(key)
+        if prepared_path is not None and _reuse(prepared_path):
+            return prepared_path
+
+        prepared_path = _prepare(path, key, target_width, target_height, cache_folder, *options)
+    except Exception:
+        return path
+
+    with _prepared_lock:
+        _prepared[key] = prepared_path
+        _prepared.move_to_end(key)
+        while len(_prepared) > _PREPARED_INDEX_SIZE:
+            _prepared.popitem(last=False)
+    return prepared_path
+
+
+def _reuse(path):
+    """Whether a prepared image still exists; refreshes its mtime so other processes' sweepers keep it"""
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def _is_photo(pil_img):
+    """Whether a PNG looks like a photograph (opaque, many colours) rather than a diagram"""
+    if pil_img.mode not in ('RGB', 'L'):
+        return False
+    return pil_img.getcolors(maxcolors=4096) is None
+
+
+def _prepare(path, key, target_width, target_height, cache_folder, quality=JPEG_QUALITY,
+             photos_as_jpeg=False, grayscale=False, originals=False):
+    """Resample and re-encode one image, or return path if it is already fine"""
+    with PILImage.open(path) as pil_img:
+        orientation = _orientation(pil_img)
+        transposed = orientation in _TRANSPOSED_ORIENTATIONS
+        stored_target = (target_height, target_width) if transposed else (target_width, target_height)
+
+        too_large = not originals and (pil_img.width > stored_target[0] or pil_img.height > stored_target[1])
+        photo_to_jpeg = photos_as_jpeg and pil_img.format == 'PNG' and _is_photo(pil_img)
+        if not (too_large or photo_to_jpeg or grayscale) and orientation == 1 and pil_img.format in ('JPEG', 'PNG'):
+            return path
+
+        # Look for a previous preparation written by another process
+        for ext in ('jpg', 'png'):
+            existing = os.path.join(cache_folder, f'{key}.{ext}')
+            if _reuse(existing):
+                return existing
+
+        source_format = pil_img.format
+        if source_format == 'JPEG' and too_large:
+            # Let the decoder skip detail we are about to throw away
+            pil_img.draft('L' if grayscale else 'RGB', stored_target)
+
+        img = ImageOps.exif_transpose(pil_img)
+        if too_large and (img.width > target_width or img.height > target_height):
+            img = img.resize((target_width, target_height), PILImage.LANCZOS)
+
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        if grayscale:
+            img = img.convert('LA' if has_alpha else 'L')
+        if (source_format == 'JPEG' or photo_to_jpeg) and not has_alpha:
+            ext, save_args = 'jpg', {'format': 'JPEG', 'quality': quality}
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+        else:
+            ext, save_args = 'png', {'format': 'PNG'}
+
+        os.makedirs(cache_folder, exist_ok=True)
+        prepared_path = os.path.join(cache_folder, f'{key}.{ext}')
+        temp_path = f'{prepared_path}.{os.getpid()}.tmp'
+        try:
+            img.save(temp_path, **save_args)
+            os.replace(temp_path, prepared_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return prepared_path
@@ -0,0 +1,244 @@
+"""
+Render Jobs Module
+Runs parse_text + generate_pdf in a pool of worker processes and tracks job status
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.parser import iter_blocks, iter_lines, parse_text
+from utils.pdf_generator import generate_comparison, generate_pdf
+from utils.images import DEFAULT_DPI
+from utils.merge import MergeTemplate
+from utils.profiles import DEFAULT_PROFILE
+
+# Job states reported by /jobs/<id>
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def render_document(text_content, image_paths, theme, output_path, alignment='left', text_path=None,
+                    image_dpi=DEFAULT_DPI, profile=DEFAULT_PROFILE):
+    """
+    Parse the text and write the themed PDF (runs inside a worker process)
+    
+    When text_path is given the text is streamed from that file instead.
+    """
+    if text_path is not None:
+        with open(text_path, 'rb') as f:
+            return _render_to(iter_blocks(iter_lines(f), image_paths), theme, output_path, alignment, image_dpi,
+                              profile)
+    return _render_to(parse_text(text_content, image_paths), theme, output_path, alignment, image_dpi, profile)
+
+
+def _render_to(parsed_content, theme, output_path, alignment, image_dpi, profile):
+    return _write_to(output_path, lambda temp_path: generate_pdf(parsed_content, theme, temp_path, alignment,
+                                                                  image_dpi, profile))
+
+
+def render_parsed(parsed_content, theme, output_path, alignment='left', image_dpi=DEFAULT_DPI,
+                  profile=DEFAULT_PROFILE):
+    """Write the themed PDF for already parsed content (runs inside a worker process)"""
+    return _render_to(parsed_content, theme, output_path, alignment, image_dpi, profile)
+
+
+def render_comparison(parsed_content, themes, output_path, alignment='left', image_dpi=DEFAULT_DPI,
+                      profile=DEFAULT_PROFILE, pages=1):
+    """Write a side-by-side sheet of the first pages in each theme (runs inside a worker process)"""
+    return _write_to(output_path, lambda temp_path: generate_comparison(parsed_content, themes, temp_path,
+                                                                         alignment, image_dpi, profile, pages))
+
+
+def render_merge(parsed_content, records, theme, output_paths, alignment='left', image_dpi=DEFAULT_DPI,
+                 profile=DEFAULT_PROFILE):
+    """
+    Write one PDF per record of a mail-merge template (runs inside a worker process)
+
+    The template is compiled once for the whole chunk of records. Returns
+    an error message (or None) per record, so a bad record only fails itself.
+    """
+    template = MergeTemplate(parsed_content, theme, alignment, image_dpi, profile)
+    errors = []
+    for record, output_path in zip(records, output_paths):
+        try:
+            _write_to(output_path, lambda temp_path: template.render(record, temp_path))
+            errors.append(None)
+        except Exception as e:
+            errors.append(str(e))
+    return errors
+
+
+def render_merge_combined(parsed_content, records, theme, output_path, alignment='left', image_dpi=DEFAULT_DPI,
+                          profile=DEFAULT_PROFILE):
+    """Write every record of a mail-merge template into one PDF (runs inside a worker process)"""
+    template = MergeTemplate(parsed_content, theme, alignment, image_dpi, profile)
+    return _write_to(output_path, lambda temp_path: template.render_combined(records, temp_path))
+
+
+def _write_to(output_path, render):
+    """Call render(temp_path) for a file next to output_path, then move it into place"""
+    # Write to a private file first so a concurrent render of the same
+    # content never exposes a half-written PDF
+    temp_path = f'{output_path}.{os.getpid()}.tmp'
+    try:
+        render(temp_path)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return output_path
+
+
+class JobQueue:
+    """Submits render jobs to a ProcessPoolExecutor and remembers their outcome"""
+
+    def __init__(self, max_workers, job_ttl=3600, initializer=None, initargs=()):
+        self.max_workers = max_workers
+        self.job_ttl = job_ttl
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_workers > 0
+
+    def _get_executor(self):
+        # The pool is created on first use so importing the app never forks;
+        # workers are forked from the warmed-up app and inherit its state
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer,
+                                                 initargs=self.initargs)
+        return self._executor
+
+    def submit(self, fn, *args, filename=None, on_success=None, on_finished=None):
+        """
+        Queue fn(*args) on the pool and return the new job id
+
+        on_success() is called once the job finishes cleanly (before the job
+        is reported as done; if it raises, the job fails), and on_finished()
+        after it finishes either way.
+        """
+        job_id = self.create(filename)
+        self.start(job_id, fn, *args, on_success=on_success, on_finished=on_finished)
+        return job_id
+
+    def create(self, filename=None):
+        """Record a queued job that start() will hand to the pool later; returns its id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': QUEUED,
+                'filename': filename,
+                'error': None,
+                'created': time.time(),
+                'finished': None
+            }
+        return job_id
+
+    def start(self, job_id, fn, *args, on_success=None, on_finished=None):
+        """Submit fn(*args) to the pool for a job made by create(); callbacks as for submit()"""
+        with self._lock:
+            job = self._jobs[job_id]
+            try:
+                future = self._submit(fn, args)
+            except Exception as e:
+                future = None
+                job['status'] = FAILED
+                job['error'] = str(e)
+                job['finished'] = time.time()
+        if future is None:
+            if on_finished is not None:
+                on_finished()
+            return
+
+        def _finished(future):
+            error = future.exception()
+            # The job only counts as done once on_success has stored the result
+            if error is None and on_success is not None:
+                try:
+                    on_success()
+                except Exception as e:
+                    error = e
+            with self._lock:
+                job['finished'] = time.time()
+                if error is None:
+                    job['status'] = DONE
+                else:
+                    job['status'] = FAILED
+                    job['error'] = str(error)
+            if on_finished is not None:
+                on_finished()
+
+        job['future'] = future
+        future.add_done_callback(_finished)
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool without tracking it as a job; returns the Future"""
+        with self._lock:
+            return self._submit(fn, args)
+
+    def _submit(self, fn, args):
+        """Submit to the pool (caller holds the lock)"""
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died and took the pool with it; start a fresh one
+            self._executor = None
+            return self._get_executor().submit(fn, *args)
+
+    def add_finished(self, filename):
+        """Record a job that was satisfied without rendering (e.g. a cache hit)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': DONE,
+                'filename': filename,
+                'error': None,
+                'created': now,
+                'finished': now
+            }
+        return job_id
+
+    def get(self, job_id):
+        """Return a JSON-friendly snapshot of a job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = job['status']
+            future = job.get('future')
+            if status == QUEUED and future is not None and future.running():
+                status = RUNNING
+            return {
+                'id': job['id'],
+                'status': status,
+                'filename': job['filename'] if status == DONE else None,
+                'error': job['error']
+            }
+
+    def _prune(self):
+        """Forget finished jobs older than job_ttl (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished'] is not None and job['finished'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
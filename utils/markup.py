@@ -0,0 +1,96 @@
+"""
+Inline Markup Module
+Compiles **bold**, *italic* and ***both*** to escaped ReportLab paragraph markup
+"""
+
+import re
+from functools import lru_cache
+
+# Lines up to this long are memoised (headings, footers, disclaimers repeat a lot)
+CACHE_MAX_CHARS = 1024
+CACHE_SIZE = 4096
+
+# Star runs; split() puts them at the odd indices
+_STARS = re.compile(r'(\*+)')
+
+# Tags for the number of stars a pair of delimiters uses, outermost first
+_TAGS = {1: ('i',), 2: ('b',), 3: ('b', 'i')}
+
+
+def escape(text):
+    """Escape text for use inside a ReportLab paragraph"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+class _Opener:
+    """A star run that may open emphasis; its part is written once its tags are known"""
+
+    __slots__ = ('index', 'prefix', 'stars', 'tags')
+
+    def __init__(self, index, prefix, stars):
+        self.index = index
+        self.prefix = prefix
+        self.stars = stars
+        self.tags = ''
+
+
+def _compile(text):
+    if '&' in text or '<' in text or '>' in text:
+        text = escape(text)
+    if '*' not in text:
+        return text
+
+    parts = _STARS.split(text)
+    openers = []
+    for index in range(1, len(parts), 2):
+        before, after = parts[index - 1], parts[index + 1]
+        remaining = len(parts[index])
+        closing = ''
+
+        # A run closes emphasis after text and opens it before text
+        if before and not before[-1].isspace():
+            while remaining and openers:
+                opener = openers[-1]
+                used = min(remaining, opener.stars, 3)
+                tags = _TAGS[used]
+                opener.tags = ''.join(f'<{tag}>' for tag in tags) + opener.tags
+                opener.stars -= used
+                remaining -= used
+                closing += ''.join(f'</{tag}>' for tag in reversed(tags))
+                if not opener.stars:
+                    parts[opener.index] = opener.prefix + opener.tags
+                    openers.pop()
+
+        if remaining and after and not after[0].isspace():
+            openers.append(_Opener(index, closing, remaining))
+        else:
+            parts[index] = closing + '*' * remaining
+
+    # Stars that found no closer stay literal, outside any tags they did open
+    for opener in openers:
+        parts[opener.index] = opener.prefix + '*' * opener.stars + opener.tags
+    return ''.join(parts)
+
+
+_cached_compile = lru_cache(maxsize=CACHE_SIZE)(_compile)
+
+
+def to_markup(text):
+    """
+    Convert one line of inline-formatted text to ReportLab paragraph markup
+
+    &, < and > are escaped, then the line is split once on star runs, which
+    pair up as emphasis delimiters. A run opens emphasis when text
+    follows it and closes the innermost open one when text precedes it, so
+    "2 * 3 * 4" stays literal and nesting such as "**bold *both***" comes
+    out as properly nested tags. Stars that pair with nothing are kept.
+    Short lines are memoised in an LRU cache.
+    """
+    if len(text) > CACHE_MAX_CHARS:
+        return _compile(text)
+    return _cached_compile(text)
+
+
+def cache_stats():
+    info = _cached_compile.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'entries': info.currsize, 'max_entries': info.maxsize}
@@ -0,0 +1,188 @@
+"""
+Mail Merge Module
+Renders one template once per record, rebuilding only the blocks that hold {{field}} placeholders
+"""
+
+import copy
+import csv
+import io
+import json
+import re
+
+from reportlab.platypus import PageBreak, Paragraph
+
+from utils.images import DEFAULT_DPI
+from utils.metrics import metrics
+from utils.pdf_generator import (
+    FlowableFeed, build_document, create_document, get_stylesheet, get_theme, iter_flowables
+)
+from utils.profiles import DEFAULT_PROFILE, get_profile
+
+# {{field}} or {{ field }}; names may contain spaces, as CSV headers often do
+PLACEHOLDER = re.compile(r'\{\{\s*([^{}]+?)\s*\}\}')
+
+RECORD_FORMATS = {'csv', 'jsonl'}
+
+
+def block_fields(block):
+    """Names of the placeholders in one parsed block"""
+    if block['type'] == 'list':
+        return {name for item in block['items'] for name in PLACEHOLDER.findall(item)}
+    return set(PLACEHOLDER.findall(block.get('content', '')))
+
+
+def missing_fields(record, fields):
+    """The fields a record has no value for, sorted"""
+    return sorted(name for name in fields if record.get(name) is None)
+
+
+def fill_block(block, record):
+    """Copy of a parsed block with its placeholders replaced by the record's values"""
+    def value(match):
+        name = match.group(1)
+        if record.get(name) is None:
+            raise ValueError(f'Record has no value for {{{{{name}}}}}')
+        return str(record[name])
+
+    if block['type'] == 'list':
+        return dict(block, items=[PLACEHOLDER.sub(value, item) for item in block['items']])
+    if 'content' not in block:
+        return block
+    return dict(block, content=PLACEHOLDER.sub(value, block['content']))
+
+
+def read_records(data, record_format, max_records=None):
+    """
+    Parse a CSV (header row first) or JSONL upload into a list of dicts
+
+    Raises ValueError for an unknown format, malformed input, or more than
+    max_records records.
+    """
+    if record_format not in RECORD_FORMATS:
+        raise ValueError('Records must be a .csv or .jsonl file')
+    text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+
+    if record_format == 'csv':
+        rows = csv.DictReader(io.StringIO(text, newline=''))
+    else:
+        rows = (_json_record(line, number) for number, line in enumerate(text.splitlines(), 1) if line.strip())
+
+    records = []
+    for row in rows:
+        records.append(row)
+        if max_records is not None and len(records) > max_records:
+            raise ValueError(f'At most {max_records} records per merge')
+    return records
+
+
+def _json_record(line, number):
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        raise ValueError(f'Line {number} of the records is not valid JSON')
+    if not isinstance(record, dict):
+        raise ValueError(f'Line {number} of the records is not a JSON object')
+    return record
+
+
+class _StaticParagraph(Paragraph):
+    """
+    Paragraph whose line breaks are worked out once per width
+
+    The memo is shared by every shallow copy, so a paragraph that appears
+    in each record is only broken into lines for the first one.
+    """
+
+    def wrap(self, availWidth, availHeight):
+        # Pieces made by split() are new paragraphs without a memo
+        line_breaks = getattr(self, '_line_breaks', None)
+        if line_breaks is None:
+            return Paragraph.wrap(self, availWidth, availHeight)
+        memo = line_breaks.get(availWidth)
+        if memo is None:
+            before = dict(self.__dict__)
+            size = Paragraph.wrap(self, availWidth, availHeight)
+            if getattr(self, 'width', None) == availWidth:
+                # Everything wrap set or replaced: line breaks, sizes, the word-split frags
+                line_breaks[availWidth] = {name: value for name, value in self.__dict__.items()
+                                           if before.get(name, before) is not value}
+            return size
+        self.__dict__.update(memo)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        # Splitting edits the line fragments in place; keep the shared ones intact
+        if getattr(self, '_line_breaks', None) is not None and hasattr(self, 'blPara'):
+            self.blPara = copy.deepcopy(self.blPara)
+        return Paragraph.split(self, availWidth, availHeight)
+
+
+class MergeTemplate:
+    """
+    A parsed template, compiled for one theme and set of render options
+
+    Runs of blocks without placeholders are turned into flowables once, and
+    each record gets shallow copies of them: the parsed paragraph text, its
+    line breaks and prepared images are shared, while the layout state
+    ReportLab keeps on a flowable stays per placement. Only blocks with
+    placeholders go through iter_flowables again, with the record's values
+    filled in.
+    """
+
+    def __init__(self, parsed_content, theme_name, text_alignment='left', image_dpi=DEFAULT_DPI,
+                 profile=DEFAULT_PROFILE):
+        self.theme = get_theme(theme_name)
+        self.output_profile = get_profile(profile)
+        self.styles = get_stylesheet(theme_name, text_alignment)
+        self.image_dpi = image_dpi
+        self.fields = set()
+        self.parts = []  # a list of flowables for static runs, a block for each templated one
+
+        static = []
+        for block in parsed_content:
+            names = block_fields(block)
+            if not names:
+                static.append(block)
+                continue
+            self._add_static(static)
+            static = []
+            self.fields |= names
+            self.parts.append(block)
+        self._add_static(static)
+
+    def _add_static(self, blocks):
+        if not blocks:
+            return
+        flowables = list(iter_flowables(blocks, self.styles, self.image_dpi, self.output_profile))
+        for flowable in flowables:
+            if type(flowable) is Paragraph:
+                flowable.__class__ = _StaticParagraph
+                flowable._line_breaks = {}
+        self.parts.append(flowables)
+
+    def flowables(self, record):
+        """Flowables for one record; raises ValueError if it lacks a field"""
+        filled = [part if isinstance(part, list) else fill_block(part, record) for part in self.parts]
+        for part in filled:
+            if isinstance(part, list):
+                yield from map(copy.copy, part)
+            else:
+                yield from iter_flowables([part], self.styles, self.image_dpi, self.output_profile)
+
+    def _build(self, output_path, story):
+        doc = create_document(output_path, self.theme, pageCompression=self.output_profile.compress)
+        build_document(doc, FlowableFeed(metrics.iter_stage('story', story)), self.theme)
+
+    def render(self, record, output_path):
+        """Write the PDF for one record"""
+        self._build(output_path, self.flowables(record))
+
+    def render_combined(self, records, output_path):
+        """Write every record into one PDF, each starting on a new page"""
+        def story():
+            for number, record in enumerate(records):
+                if number:
+                    yield PageBreak()
+                yield from self.flowables(record)
+        self._build(output_path, story())
+
@@ -0,0 +1,224 @@
+"""
+Metrics Module
+Per-stage render timers, Server-Timing values and Prometheus histograms
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# Histogram buckets (upper bounds)
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+BYTE_BUCKETS = (10e3, 50e3, 100e3, 500e3, 1e6, 5e6, 10e6, 50e6, 100e6, 500e6)
+
+# Histogram families: name -> (help text, buckets)
+HISTOGRAMS = {
+    'velvetdocs_stage_seconds': ('Time spent in each render stage, excluding nested stages', TIME_BUCKETS),
+    'velvetdocs_request_seconds': ('Time taken to handle a request, by endpoint', TIME_BUCKETS),
+    'velvetdocs_pdf_pages': ('Pages per rendered PDF', PAGE_BUCKETS),
+    'velvetdocs_pdf_bytes': ('Bytes written per rendered PDF', BYTE_BUCKETS)
+}
+
+
+class Histogram:
+    """Bucket counts, sum and count for one label set"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _NullStage:
+    """Stand-in returned by Metrics.stage while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """
+    Times one stage, reporting its time minus that of any stages nested in it
+
+    With record=False the time is added to self.total instead, so a stage
+    entered many times can be reported once.
+    """
+
+    __slots__ = ('metrics', 'name', 'record', 'total', 'started', 'nested')
+
+    def __init__(self, metrics, name, record=True):
+        self.metrics = metrics
+        self.name = name
+        self.record = record
+        self.total = 0.0
+
+    def __enter__(self):
+        self.nested = 0.0
+        self.metrics._stack().append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        stack = self.metrics._stack()
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        if self.record:
+            self.metrics._record_stage(self.name, elapsed - self.nested)
+        else:
+            self.total += elapsed - self.nested
+        return False
+
+
+class Metrics:
+    """
+    Collects stage timings for the current request and process-wide histograms
+
+    Code under measurement wraps each stage in `with metrics.stage('name'):`.
+    Stages may nest; each one is charged only for its own time, so the stages
+    of a request add up to (at most) the request's total. Timings of the
+    request running on the current thread are kept separately between
+    begin_request() and end_request() for the Server-Timing header.
+
+    While disabled, stage() returns a shared no-op context manager and
+    observe() returns immediately.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}  # (family, labels) -> Histogram
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name):
+        """Context manager timing the named stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def iter_stage(self, name, iterable):
+        """
+        Wrap an iterable so the time spent producing each item counts as stage name
+
+        Used for generators that are consumed inside another stage, such as a
+        streamed parse feeding the layout.
+        """
+        if not self.enabled:
+            return iterable
+        return self._iter_stage(name, iter(iterable))
+
+    def _iter_stage(self, name, iterator):
+        stage = _Stage(self, name, record=False)
+        try:
+            while True:
+                with stage:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            self._record_stage(name, stage.total)
+
+    def _record_stage(self, name, seconds):
+        timings = getattr(self._local, 'timings', None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+        self.observe('velvetdocs_stage_seconds', seconds, stage=name)
+
+    def observe(self, family, value, **labels):
+        """Add a value to a histogram family from HISTOGRAMS"""
+        if not self.enabled:
+            return
+        key = (family, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAMS[family][1])
+            histogram.observe(value)
+
+    def begin_request(self):
+        """Start collecting stage timings for the request on this thread"""
+        if self.enabled:
+            self._local.timings = {}
+            self._local.stack = []
+            self._local.started = time.perf_counter()
+
+    def end_request(self, endpoint=None):
+        """
+        Stop collecting for this thread's request
+
+        Returns a list of (stage, seconds) ending with ('total', seconds), or
+        an empty list if no request was being measured.
+        """
+        timings = getattr(self._local, 'timings', None)
+        if timings is None:
+            return []
+        total = time.perf_counter() - self._local.started
+        self._local.timings = None
+        self.observe('velvetdocs_request_seconds', total, endpoint=endpoint or 'unknown')
+        return list(timings.items()) + [('total', total)]
+
+    def render(self, gauges=()):
+        """
+        Return every histogram in the Prometheus text exposition format
+
+        gauges is an iterable of (name, type, help, value) tuples for values
+        owned elsewhere, such as render cache counters.
+        """
+        with self._lock:
+            snapshot = [(family, labels, list(h.counts), h.sum, h.count)
+                        for (family, labels), h in sorted(self._histograms.items())]
+
+        lines = []
+        for family, (help_text, buckets) in HISTOGRAMS.items():
+            lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} histogram')
+            for name, labels, counts, total, count in snapshot:
+                if name != family:
+                    continue
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                prefix = label_text + ',' if label_text else ''
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    lines.append(f'{family}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                suffix = '{' + label_text + '}' if label_text else ''
+                lines.append(f'{family}_sum{suffix} {total:.6f}')
+                lines.append(f'{family}_count{suffix} {count}')
+
+        for name, metric_type, help_text, value in gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def server_timing(timings):
+    """Format (stage, seconds) pairs as a Server-Timing header value"""
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings)
+
+
+# Shared by the app, parser and PDF generator; the app decides whether it is enabled
+metrics = Metrics()
@@ -3,8 +3,24 @@ Text Parser Module
 Detects markdown-like structures and converts to structured format
 """
 
+import codecs
 import re
 
+from utils.metrics import metrics
+
+# Image placeholder: [IMG:0:center] or [IMG:1:left] etc.
+IMAGE_PATTERN = re.compile(r'\[IMG:(\d+)(?::(\w+))?\]')
+
+# Block markers are the text before the first space on a line ("## Title" -> "##")
+BLOCK_TYPES = {
+    '#': 'h1',
+    '##': 'h2',
+    '###': 'h3',
+    '>': 'blockquote',
+    '-': 'list',
+    '*': 'list'
+}
+
 def parse_text(text, uploaded_images=None):
     """
     Parse input text and detect markdown-like patterns
@@ -24,131 +40,89 @@ def parse_text(text, uploaded_images=None):
     if uploaded_images is None:
         uploaded_images = []
     
-    lines = text.split('\n')
-    parsed = []
-    in_list = False
+    with metrics.stage('parse'):
+        return list(iter_blocks(text.split('\n'), uploaded_images))
+
+def iter_lines(stream, encoding='utf-8', chunk_size=64 * 1024):
+    """
+    Yield the lines of a text or binary file object without reading it all at once
+    
+    Lines are split on '\n' like parse_text does; bytes are decoded incrementally.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        pending += chunk
+        lines = pending.split('\n')
+        pending = lines.pop()
+        yield from lines
+    
+    yield pending + decoder.decode(b'', final=True)
+
+def iter_blocks(lines, uploaded_images=None):
+    """
+    Parse an iterable of lines, yielding one block dictionary at a time
+    
+    This is the streaming form of parse_text: feed it iter_lines() over an
+    uploaded file and only the current list is ever held in memory.
+    """
+    if uploaded_images is None:
+        uploaded_images = []
+    
+    block_types = BLOCK_TYPES
+    match_image = IMAGE_PATTERN.match
     list_items = []
     
     for line in lines:
         line = line.rstrip()
         
         # Skip empty lines but preserve spacing
-        if not line.strip():
-            if in_list:
-                parsed.append({'type': 'list', 'items': list_items})
+        if not line:
+            if list_items:
+                yield {'type': 'list', 'items': list_items}
                 list_items = []
-                in_list = False
-            parsed.append({'type': 'space', 'content': ''})
+            yield {'type': 'space', 'content': ''}
             continue
         
-        # Image placeholder: [IMG:0:center] or [IMG:1:left] etc.
-        img_match = re.match(r'\[IMG:(\d+)(?::(\w+))?\]', line.strip())
-        if img_match:
-            if in_list:
-                parsed.append({'type': 'list', 'items': list_items})
-                list_items = []
-                in_list = False
-            
-            img_index = int(img_match.group(1))
-            img_alignment = img_match.group(2) if img_match.group(2) else 'center'
-            
-            if img_index < len(uploaded_images):
-                parsed.append({
-                    'type': 'image',
-                    'path': uploaded_images[img_index],
-                    'alignment': img_alignment
-                })
-            continue
-        
-        # Heading 1: # Text
-        if line.startswith('# ') and not line.startswith('## '):
-            if in_list:
-                parsed.append({'type': 'list', 'items': list_items})
-                list_items = []
-                in_list = False
-            parsed.append({'type': 'h1', 'content': line[2:].strip()})
+        marker, separator, rest = line.partition(' ')
+        block_type = block_types.get(marker) if separator else None
         
-        # Heading 2: ## Text
-        elif line.startswith('## ') and not line.startswith('### '):
-            if in_list:
-                parsed.append({'type': 'list', 'items': list_items})
-                list_items = []
-                in_list = False
-            parsed.append({'type': 'h2', 'content': line[3:].strip()})
+        # List items accumulate until any other block ends the list
+        if block_type == 'list':
+            list_items.append(rest.strip())
+            continue
         
-        # Heading 3: ### Text
-        elif line.startswith('### '):
-            if in_list:
-                parsed.append({'type': 'list', 'items': list_items})
-                list_items = []
-                in_list = False
-            parsed.append({'type': 'h3', 'content': line[4:].strip()})
+        if list_items:
+            yield {'type': 'list', 'items': list_items}
+            list_items = []
         
-        # Blockquote: > Text
-        elif line.startswith('> '):
-            if in_list:
-                parsed.append({'type': 'list', 'items': list_items})
-                list_items = []
-                in_list = False
-            parsed.append({'type': 'blockquote', 'content': line[2:].strip()})
+        # Headings and blockquotes
+        if block_type is not None:
+            yield {'type': block_type, 'content': rest.strip()}
+            continue
         
-        # List item: - Text or * Text
-        elif line.startswith('- ') or line.startswith('* '):
-            content = line[2:].strip()
-            list_items.append(content)
-            in_list = True
+        # Image placeholder (may be indented)
+        if '[IMG:' in line:
+            img_match = match_image(line.lstrip())
+            if img_match:
+                img_index = int(img_match.group(1))
+                if img_index < len(uploaded_images):
+                    yield {
+                        'type': 'image',
+                        'path': uploaded_images[img_index],
+                        'alignment': img_match.group(2) or 'center'
+                    }
+                continue
         
         # Regular paragraph
-        else:
-            if in_list:
-                parsed.append({'type': 'list', 'items': list_items})
-                list_items = []
-                in_list = False
-            parsed.append({'type': 'paragraph', 'content': line})
+        yield {'type': 'paragraph', 'content': line}
     
     # Close any remaining list
-    if in_list:
-        parsed.append({'type': 'list', 'items': list_items})
-    
-    return parsed
-
-def parse_inline_formatting(text):
-    """
-    Parse inline formatting like **bold** and *italic*
-    Returns list of tuples: (text, format) where format is 'normal', 'bold', or 'italic'
-    """
-    result = []
-    current_pos = 0
-    
-    # Find all bold patterns (**text**)
-    bold_pattern = r'\*\*(.+?)\*\*'
-    # Find all italic patterns (*text*)
-    italic_pattern = r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)'
-    
-    # Combine patterns
-    combined_pattern = r'(\*\*(.+?)\*\*)|(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)'
-    
-    matches = list(re.finditer(combined_pattern, text))
-    
-    for match in matches:
-        # Add text before match
-        if match.start() > current_pos:
-            result.append((text[current_pos:match.start()], 'normal'))
-        
-        # Determine if bold or italic
-        if match.group(1):  # Bold
-            result.append((match.group(2), 'bold'))
-        elif match.group(3):  # Italic
-            result.append((match.group(3), 'italic'))
-        
-        current_pos = match.end()
-    
-    # Add remaining text
-    if current_pos < len(text):
-        result.append((text[current_pos:], 'normal'))
-    
-    # If no formatting found, return original text as normal
-    if not result:
-        result.append((text, 'normal'))
-    
-    return result
+    if list_items:
+        yield {'type': 'list', 'items': list_items}
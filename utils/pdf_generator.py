@@ -10,8 +10,13 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER, TA_RIGHT
 from reportlab.pdfgen import canvas
 from datetime import datetime
-from PIL import Image as PILImage
+import math
 import os
+import tempfile
+import threading
+import time
+from collections import deque
+from types import MappingProxyType
 
 # Import all themes
 from themes.academic import AcademicTheme
@@ -20,7 +25,11 @@ from themes.modern_colorblock import ModernColorblockTheme
 from themes.elegant_dark import ElegantDarkTheme
 from themes.corporate_blue import CorporateBlueTheme
 from themes.softpastel import SoftPastelTheme
-from utils.parser import parse_inline_formatting
+from utils.fonts import resolve_font
+from utils.images import DEFAULT_DPI, image_size, prepare_image
+from utils.markup import escape, to_markup
+from utils.metrics import metrics
+from utils.profiles import DEFAULT_PROFILE, get_profile
 
 # Theme registry
 THEME_CLASSES = {
@@ -32,6 +41,31 @@ THEME_CLASSES = {
     'softpastel': SoftPastelTheme
 }
 
+# Renders larger than this spill from memory to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Preview renders stop after this many pages or seconds, whichever comes first
+PREVIEW_PAGES = 2
+PREVIEW_TIME_BUDGET = 1.0
+
+# Theme comparison sheets: page thumbnails at this scale, at most this many per row
+COMPARISON_SCALE = 0.5
+COMPARISON_COLUMNS = 3
+COMPARISON_GAP = 0.25 * inch
+COMPARISON_LABEL_HEIGHT = 0.3 * inch
+
+# Space left after each kind of block
+BLOCK_SPACING = {
+    'h1': 0.3 * inch,
+    'h2': 0.2 * inch,
+    'h3': 0.15 * inch,
+    'paragraph': 0.15 * inch,
+    'blockquote': 0.15 * inch,
+    'list': 0.15 * inch,
+    'image': 0.2 * inch,
+    'space': 0.1 * inch
+}
+
 # Alignment mapping
 ALIGNMENT_MAP = {
     'left': TA_LEFT,
@@ -40,77 +74,201 @@ ALIGNMENT_MAP = {
     'justify': TA_JUSTIFY
 }
 
-def generate_pdf(parsed_content, theme_name, output_path, text_alignment='left'):
+# Compiled stylesheets shared read-only across requests, keyed by (theme, alignment)
+_theme_instances = {}
+_stylesheets = {}
+_stylesheet_lock = threading.Lock()
+
+def get_theme(theme_name):
+    """Return the shared theme instance for theme_name (Academic if unknown)"""
+    if theme_name not in THEME_CLASSES:
+        theme_name = 'academic'
+    theme = _theme_instances.get(theme_name)
+    if theme is None:
+        with _stylesheet_lock:
+            theme = _theme_instances.get(theme_name)
+            if theme is None:
+                theme = THEME_CLASSES[theme_name]()
+                _theme_instances[theme_name] = theme
+    return theme
+
+def get_stylesheet(theme_name, text_alignment='left'):
+    """
+    Return the compiled styles for a theme and body text alignment
+    
+    Styles are built once per (theme, alignment) and shared between requests,
+    so the returned mapping and its ParagraphStyles must not be modified.
+    Font names are resolved through the font registry at the same time, so
+    themes can name TTF families from the fonts folder.
+    """
+    if theme_name not in THEME_CLASSES:
+        theme_name = 'academic'
+    if text_alignment not in ALIGNMENT_MAP:
+        text_alignment = None
+    key = (theme_name, text_alignment)
+    
+    styles = _stylesheets.get(key)
+    if styles is None:
+        theme = get_theme(theme_name)
+        with _stylesheet_lock:
+            styles = _stylesheets.get(key)
+            if styles is None:
+                compiled = theme.get_styles()
+                for style in compiled.values():
+                    style.fontName = resolve_font(style.fontName)
+                # Apply global alignment to body text if specified
+                if text_alignment is not None:
+                    compiled['BodyText'].alignment = ALIGNMENT_MAP[text_alignment]
+                styles = MappingProxyType(compiled)
+                _stylesheets[key] = styles
+    return styles
+
+def precompile_stylesheets():
+    """Build the stylesheet for every theme and alignment up front"""
+    for theme_name in THEME_CLASSES:
+        for text_alignment in ALIGNMENT_MAP:
+            get_stylesheet(theme_name, text_alignment)
+
+def generate_pdf(parsed_content, theme_name, output_path, text_alignment='left', image_dpi=DEFAULT_DPI,
+                 profile=DEFAULT_PROFILE):
     """
     Generate PDF from parsed content using specified theme
     
     Args:
-        parsed_content: List of parsed text elements
+        parsed_content: List (or any iterable) of parsed text elements
         theme_name: Name of theme to apply
-        output_path: Path where PDF will be saved
+        output_path: Path where PDF will be saved, or a writable binary file object
         text_alignment: Global text alignment (left/center/right/justify)
+        image_dpi: Resolution images are resampled to for their size on the page
+        profile: Name of the output profile (compression and image encoding)
     """
-    # Get theme class
-    theme_class = THEME_CLASSES.get(theme_name, AcademicTheme)
-    theme = theme_class()
+    # Get the shared theme instance
+    theme = get_theme(theme_name)
+    output_profile = get_profile(profile)
     
     # Create PDF document
-    doc = SimpleDocTemplate(
+    doc = create_document(output_path, theme, pageCompression=output_profile.compress)
+    
+    # Get the precompiled styles for this theme and alignment
+    styles = get_stylesheet(theme_name, text_alignment)
+    
+    # Flowables are produced lazily while ReportLab lays out the pages
+    story = FlowableFeed(metrics.iter_stage('story', iter_flowables(parsed_content, styles, image_dpi,
+                                                                    output_profile)))
+    
+    build_document(doc, story, theme)
+    
+    if metrics.enabled:
+        size = os.path.getsize(output_path) if isinstance(output_path, str) else output_path.tell()
+        metrics.observe('velvetdocs_pdf_pages', doc.page)
+        metrics.observe('velvetdocs_pdf_bytes', size)
+
+def create_document(output_path, theme, template=SimpleDocTemplate, **options):
+    """Create the document template with the theme's page size and margins"""
+    return template(
         output_path,
         pagesize=letter,
         rightMargin=theme.margins['right'],
         leftMargin=theme.margins['left'],
         topMargin=theme.margins['top'],
-        bottomMargin=theme.margins['bottom']
+        bottomMargin=theme.margins['bottom'],
+        **options
     )
+
+class TimedCanvas(canvas.Canvas):
+    """Canvas that reports serialising the finished PDF as the 'write' stage"""
+    
+    def save(self):
+        with metrics.stage('write'):
+            super().save()
+
+def build_document(doc, story, theme, canvasmaker=TimedCanvas):
+    """
+    Lay out the story and write the PDF, with the theme's header and footer
+    
+    Timed as the 'layout' stage. Work nested inside it (building a lazy
+    story, image preparation, the final write) is charged to its own stage.
+    """
+    with metrics.stage('layout'):
+        doc.build(story, onFirstPage=lambda c, d: decorate_page(theme, c, d, 1),
+                  onLaterPages=lambda c, d: decorate_page(theme, c, d, doc.page),
+                  canvasmaker=canvasmaker)
+
+def shares_chrome(theme):
+    """
+    Whether a theme's page chrome is drawn once per document as a form
     
-    # Container for PDF elements
-    story = []
+    This is the default for every theme that defines draw_page_chrome;
+    a theme opts out by setting shared_chrome to False.
+    """
+    return getattr(theme, 'shared_chrome', hasattr(theme, 'draw_page_chrome'))
+
+def decorate_page(theme, canv, doc, page_num):
+    """
+    Draw the theme's page decorations on the current page
     
-    # Get styles from theme
-    styles = theme.get_styles()
+    Themes that share their chrome (see shares_chrome) have their
+    draw_page_chrome output recorded once per document as a Form XObject;
+    every page then references it with a single operator and only
+    draw_page_number runs per page. Other themes draw everything on every
+    page with add_page_decorations.
+    """
+    if not shares_chrome(theme):
+        theme.add_page_decorations(canv, doc, page_num)
+        return
     
-    # Apply global alignment to body text if specified
-    if text_alignment in ALIGNMENT_MAP:
-        styles['BodyText'].alignment = ALIGNMENT_MAP[text_alignment]
+    form_name = f'chrome_{type(theme).__name__}'
+    if not canv.hasForm(form_name):
+        canv.beginForm(form_name)
+        theme.draw_page_chrome(canv, doc)
+        canv.endForm()
+    canv.doForm(form_name)
+    theme.draw_page_number(canv, doc, page_num)
+
+def iter_flowables(parsed_content, styles, image_dpi=DEFAULT_DPI, profile=None):
+    """
+    Yield ReportLab flowables for parsed elements, one element at a time
     
+    parsed_content can be any iterable of parsed elements, including the
+    generator returned by utils.parser.iter_blocks. Images are prepared with
+    the image options of profile (an OutputProfile, default profile if None),
+    unless prepare_block_images already did so.
+    """
+    image_options = (profile or get_profile(DEFAULT_PROFILE)).image_options()
     # Process each parsed element
     for element in parsed_content:
         elem_type = element['type']
         
         if elem_type == 'h1':
-            para = Paragraph(element['content'], styles['Heading1'])
-            story.append(para)
-            story.append(Spacer(1, 0.3 * inch))
+            para = Paragraph(to_markup(element['content']), styles['Heading1'])
+            yield para
+            yield Spacer(1, BLOCK_SPACING['h1'])
         
         elif elem_type == 'h2':
-            para = Paragraph(element['content'], styles['Heading2'])
-            story.append(para)
-            story.append(Spacer(1, 0.2 * inch))
+            para = Paragraph(to_markup(element['content']), styles['Heading2'])
+            yield para
+            yield Spacer(1, BLOCK_SPACING['h2'])
         
         elif elem_type == 'h3':
-            para = Paragraph(element['content'], styles['Heading3'])
-            story.append(para)
-            story.append(Spacer(1, 0.15 * inch))
+            para = Paragraph(to_markup(element['content']), styles['Heading3'])
+            yield para
+            yield Spacer(1, BLOCK_SPACING['h3'])
         
         elif elem_type == 'paragraph':
-            # Process inline formatting
-            formatted_text = process_inline_formatting(element['content'], styles)
-            para = Paragraph(formatted_text, styles['BodyText'])
-            story.append(para)
-            story.append(Spacer(1, 0.15 * inch))
+            para = Paragraph(to_markup(element['content']), styles['BodyText'])
+            yield para
+            yield Spacer(1, BLOCK_SPACING['paragraph'])
         
         elif elem_type == 'blockquote':
-            para = Paragraph(element['content'], styles['Blockquote'])
-            story.append(para)
-            story.append(Spacer(1, 0.15 * inch))
+            para = Paragraph(to_markup(element['content']), styles['Blockquote'])
+            yield para
+            yield Spacer(1, BLOCK_SPACING['blockquote'])
         
         elif elem_type == 'list':
             for item in element['items']:
-                formatted_text = f"• {item}"
-                para = Paragraph(formatted_text, styles['List'])
-                story.append(para)
-            story.append(Spacer(1, 0.15 * inch))
+                para = Paragraph(f"• {to_markup(item)}", styles['List'])
+                yield para
+            yield Spacer(1, BLOCK_SPACING['list'])
         
         elif elem_type == 'image':
             # Handle image insertion
@@ -119,30 +277,21 @@ def generate_pdf(parsed_content, theme_name, output_path, text_alignment='left')
             
             if os.path.exists(img_path):
                 try:
-                    # Get image dimensions
-                    pil_img = PILImage.open(img_path)
-                    img_width, img_height = pil_img.size
-                    
-                    # Calculate scaled dimensions (max width: 6 inches)
-                    max_width = 6 * inch
-                    max_height = 7 * inch
-                    
-                    aspect_ratio = img_width / img_height
-                    
-                    if img_width > max_width:
-                        scaled_width = max_width
-                        scaled_height = max_width / aspect_ratio
+                    if 'prepared_path' in element:
+                        scaled_width, scaled_height = element['display_size']
+                        prepared_path = element['prepared_path']
                     else:
-                        scaled_width = img_width * (inch / 96)  # Assuming 96 DPI
-                        scaled_height = img_height * (inch / 96)
-                    
-                    # Ensure height doesn't exceed max
-                    if scaled_height > max_height:
-                        scaled_height = max_height
-                        scaled_width = max_height * aspect_ratio
-                    
-                    # Create image object
-                    img = Image(img_path, width=scaled_width, height=scaled_height)
+                        # Get image dimensions (after EXIF rotation)
+                        with metrics.stage('images'):
+                            img_width, img_height = image_size(img_path)
+                        
+                        scaled_width, scaled_height = image_display_size(img_width, img_height)
+                        
+                        # Create image object from a copy resampled to the output DPI
+                        with metrics.stage('images'):
+                            prepared_path = prepare_image(img_path, scaled_width, scaled_height, image_dpi,
+                                                          **image_options)
+                    img = SharedImage(prepared_path, width=scaled_width, height=scaled_height)
                     
                     # Apply alignment
                     if img_alignment == 'center':
@@ -152,37 +301,333 @@ def generate_pdf(parsed_content, theme_name, output_path, text_alignment='left')
                     else:
                         img.hAlign = 'LEFT'
                     
-                    story.append(img)
-                    story.append(Spacer(1, 0.2 * inch))
-                    
                 except Exception as e:
                     # If image fails, add error message
                     error_para = Paragraph(
-                        f"<i>[Image could not be loaded: {os.path.basename(img_path)}]</i>",
+                        f"<i>[Image could not be loaded: {escape(os.path.basename(img_path))}]</i>",
                         styles['BodyText']
                     )
-                    story.append(error_para)
-                    story.append(Spacer(1, 0.15 * inch))
+                    yield error_para
+                    yield Spacer(1, BLOCK_SPACING['paragraph'])
+                
+                else:
+                    yield img
+                    yield Spacer(1, BLOCK_SPACING['image'])
         
         elif elem_type == 'space':
-            story.append(Spacer(1, 0.1 * inch))
+            yield Spacer(1, BLOCK_SPACING['space'])
+
+def prepare_block_images(parsed_content, image_dpi=DEFAULT_DPI, profile=DEFAULT_PROFILE):
+    """
+    Prepare every image of parsed content once, for renders in several themes
     
-    # Build PDF with header and footer
-    doc.build(story, onFirstPage=lambda c, d: theme.add_page_decorations(c, d, 1),
-              onLaterPages=lambda c, d: theme.add_page_decorations(c, d, doc.page))
+    Returns a copy of the parsed elements in which image elements also carry
+    their display size and prepared path, so iter_flowables (in any theme,
+    and in any worker process) uses them as they are. Images that cannot be
+    read are left for iter_flowables to report.
+    """
+    image_options = get_profile(profile).image_options()
+    prepared = []
+    for element in parsed_content:
+        if element['type'] == 'image' and os.path.exists(element['path']):
+            try:
+                with metrics.stage('images'):
+                    display_size = image_display_size(*image_size(element['path']))
+                    prepared_path = prepare_image(element['path'], *display_size, image_dpi, **image_options)
+                element = dict(element, display_size=display_size, prepared_path=prepared_path)
+            except Exception:
+                pass
+        prepared.append(element)
+    return prepared
 
-def process_inline_formatting(text, styles):
+def image_display_size(img_width, img_height):
+    """Size in points an image of img_width x img_height pixels is shown at"""
+    # Calculate scaled dimensions (max width: 6 inches)
+    max_width = 6 * inch
+    max_height = 7 * inch
+    
+    aspect_ratio = img_width / img_height
+    
+    if img_width > max_width:
+        scaled_width = max_width
+        scaled_height = max_width / aspect_ratio
+    else:
+        scaled_width = img_width * (inch / 96)  # Assuming 96 DPI
+        scaled_height = img_height * (inch / 96)
+    
+    # Ensure height doesn't exceed max
+    if scaled_height > max_height:
+        scaled_height = max_height
+        scaled_width = max_height * aspect_ratio
+    
+    return scaled_width, scaled_height
+
+class SharedImage(Image):
+    """
+    Image flowable that always hands ReportLab the file path
+    
+    canvas.drawImage stores each distinct path as a single XObject, so every
+    [IMG:n] placement of the same stored image reuses it, without decoding
+    the pixels again just to find out they are identical.
+    """
+    
+    def draw(self):
+        self.canv.drawImage(
+            self.filename,
+            getattr(self, '_offs_x', 0),
+            getattr(self, '_offs_y', 0),
+            self.drawWidth,
+            self.drawHeight,
+            mask=self._mask
+        )
+
+class FlowableFeed:
     """
-    Convert markdown-style inline formatting to ReportLab XML
-    **bold** -> <b>bold</b>
-    *italic* -> <i>italic</i>
+    List-like view over a flowable iterator for doc.build
+    
+    ReportLab consumes the story from the front (and pushes split pieces back),
+    so only a small window of upcoming flowables has to exist at any time.
     """
-    import re
     
-    # Replace **bold**
-    text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
+    def __init__(self, flowables, lookahead=16):
+        self._source = iter(flowables)
+        self._buffer = deque()
+        self.lookahead = lookahead
+        self._stopped = False
+    
+    def _fill(self, count):
+        while len(self._buffer) < count and self._source is not None:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                self._source = None
+    
+    def __len__(self):
+        if self._stopped:
+            return 0
+        self._fill(self.lookahead)
+        return len(self._buffer)
+    
+    def stop(self):
+        """Report the feed as empty from now on, so doc.build ends after the current page"""
+        self._stopped = True
+    
+    def has_more(self):
+        """True if flowables remain, even after stop()"""
+        self._fill(1)
+        return bool(self._buffer)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._fill(index.stop if index.stop is not None else float('inf'))
+            return list(self._buffer)[index]
+        self._fill(index + 1)
+        return self._buffer[index]
+    
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            self._fill(index.stop if index.stop is not None else float('inf'))
+            items = list(self._buffer)
+            del items[index]
+            self._buffer = deque(items)
+        else:
+            self._fill(index + 1)
+            del self._buffer[index]
+    
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._fill(index.stop if index.stop is not None else float('inf'))
+            items = list(self._buffer)
+            items[index] = value
+            self._buffer = deque(items)
+        else:
+            self._fill(index + 1)
+            self._buffer[index] = value
+    
+    def insert(self, index, value):
+        self._fill(index)
+        self._buffer.insert(index, value)
+
+def generate_preview(parsed_content, theme_name, output_path, text_alignment='left', image_dpi=DEFAULT_DPI,
+                     max_pages=PREVIEW_PAGES, time_budget=PREVIEW_TIME_BUDGET, profile=DEFAULT_PROFILE):
+    """
+    Render only the first pages of a document, marked as a preview
+    
+    Layout stops once max_pages pages are done or time_budget seconds have
+    passed (always after at least one page). The story is consumed lazily,
+    so elements past the cut-off are never turned into flowables, and the
+    cost does not grow with the length of the document when parsed_content
+    is a generator.
+    
+    Returns (pages, truncated), where truncated is False if the whole
+    document fitted in the preview.
+    """
+    theme = get_theme(theme_name)
+    output_profile = get_profile(profile)
+    doc = create_document(output_path, theme, template=PreviewDocTemplate, pageCompression=output_profile.compress,
+                          max_pages=max_pages, time_budget=time_budget, subject='Preview')
+    styles = get_stylesheet(theme_name, text_alignment)
+    story = FlowableFeed(metrics.iter_stage('story', iter_flowables(parsed_content, styles, image_dpi,
+                                                                    output_profile)))
+    doc.story = story
+    
+    build_document(doc, story, theme)
+    return doc.page, story.has_more()
+
+class PreviewDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate that ends the document early and labels every page as a preview"""
     
-    # Replace *italic* (but not if it's part of **)
-    text = re.sub(r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)', r'<i>\1</i>', text)
+    def __init__(self, filename, max_pages=PREVIEW_PAGES, time_budget=PREVIEW_TIME_BUDGET,
+                 label='PREVIEW - first pages only', **kw):
+        super().__init__(filename, **kw)
+        self.max_pages = max(1, max_pages)
+        self.deadline = time.perf_counter() + time_budget
+        self.label = label
+        self.story = None
     
-    return text
+    def afterPage(self):
+        if self.label:
+            self.canv.saveState()
+            self.canv.setFont('Helvetica-Bold', 8)
+            self.canv.setFillColorRGB(0.85, 0.15, 0.15)
+            self.canv.drawRightString(self.pagesize[0] - 0.3 * inch, self.pagesize[1] - 0.3 * inch, self.label)
+            self.canv.restoreState()
+        
+        if self.page >= self.max_pages or time.perf_counter() >= self.deadline:
+            self.story.stop()
+
+def generate_pdf_stream(parsed_content, theme_name, text_alignment='left', spool_max_size=SPOOL_MAX_SIZE,
+                        image_dpi=DEFAULT_DPI, profile=DEFAULT_PROFILE):
+    """
+    Render a PDF without writing it to the output folder
+    
+    The PDF is built into a SpooledTemporaryFile that stays in memory up to
+    spool_max_size bytes. Returns (file, size) with the file rewound to the start;
+    the caller is responsible for closing it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+    try:
+        generate_pdf(parsed_content, theme_name, spool, text_alignment, image_dpi, profile)
+        size = spool.tell()
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return spool, size
+
+def generate_comparison(parsed_content, theme_names, output_path, text_alignment='left', image_dpi=DEFAULT_DPI,
+                        profile=DEFAULT_PROFILE, pages=1):
+    """
+    Render one document in several themes onto a side-by-side comparison sheet
+    
+    Each theme lays out its first pages with the normal document machinery,
+    but every page is recorded as a Form XObject on a shared ComparisonCanvas
+    instead of becoming a page. Sheet n then shows page n of every theme,
+    scaled down in a grid and labelled with the theme name. parsed_content
+    is read once per theme, so pass a list (ideally with its images already
+    prepared by prepare_block_images). Returns the number of sheets.
+    """
+    output_profile = get_profile(profile)
+    canv = ComparisonCanvas(output_path, pageCompression=output_profile.compress)
+    
+    for theme_name in theme_names:
+        theme = get_theme(theme_name)
+        doc = create_document(output_path, theme, template=PreviewDocTemplate, pageCompression=output_profile.compress,
+                              max_pages=pages, time_budget=math.inf, label=None)
+        doc._doSave = 0  # the sheet is saved once every theme is recorded
+        styles = get_stylesheet(theme_name, text_alignment)
+        story = FlowableFeed(metrics.iter_stage('story', iter_flowables(parsed_content, styles, image_dpi,
+                                                                        output_profile)))
+        doc.story = story
+        canv.start_theme(theme_name, doc.pagesize, pages)
+        build_document(doc, story, theme, canvasmaker=lambda *args, **kwargs: canv)
+        canv.end_theme()
+    
+    canv.setTitle('VelvetDocs theme comparison')
+    sheets = canv.draw_sheets(theme_names)
+    canv.save()
+    return sheets
+
+class ComparisonCanvas(TimedCanvas):
+    """
+    Canvas that turns the pages of several themed renders into one comparison sheet
+    
+    Between start_theme and end_theme, doc.build draws each page into a
+    Form XObject (showPage closes the form rather than the page);
+    draw_sheets then places the recorded pages side by side.
+    """
+    
+    def __init__(self, filename, **kw):
+        super().__init__(filename, **kw)
+        self.page_forms = {}  # (theme name, page index) -> form name
+        self.page_sizes = {}
+        self._theme_name = None
+        self._form_name = None
+    
+    def start_theme(self, theme_name, page_size, max_pages):
+        self._theme_name = theme_name
+        self._max_pages = max_pages
+        self._page_index = 0
+        self.page_sizes[theme_name] = page_size
+        self._begin_page()
+    
+    def _begin_page(self):
+        self._form_name = f'page_{self._theme_name}_{self._page_index}'
+        self.beginForm(self._form_name, 0, 0, *self.page_sizes[self._theme_name])
+    
+    def showPage(self):
+        if self._theme_name is None:
+            return super().showPage()
+        self.endForm()
+        self.page_forms[(self._theme_name, self._page_index)] = self._form_name
+        self._form_name = None
+        self._page_index += 1
+        if self._page_index < self._max_pages:
+            self._begin_page()
+    
+    def end_theme(self):
+        if self._form_name is not None:
+            # The document ended before this page started; the empty form is never shown
+            self.endForm()
+            self._form_name = None
+        self._theme_name = None
+    
+    def draw_sheets(self, theme_names):
+        """Draw one sheet per page index with every theme's page in a grid; returns the sheet count"""
+        columns = min(COMPARISON_COLUMNS, len(theme_names))
+        rows = math.ceil(len(theme_names) / columns)
+        slot_width = max(size[0] for size in self.page_sizes.values()) * COMPARISON_SCALE
+        slot_height = max(size[1] for size in self.page_sizes.values()) * COMPARISON_SCALE
+        sheet_width = columns * slot_width + (columns + 1) * COMPARISON_GAP
+        sheet_height = rows * (slot_height + COMPARISON_LABEL_HEIGHT) + (rows + 1) * COMPARISON_GAP
+        sheets = max(index for _, index in self.page_forms) + 1 if self.page_forms else 0
+        
+        self.setPageSize((sheet_width, sheet_height))
+        for page_index in range(sheets):
+            for position, theme_name in enumerate(theme_names):
+                column, row = position % columns, position // columns
+                x = COMPARISON_GAP + column * (slot_width + COMPARISON_GAP)
+                y = sheet_height - (row + 1) * (slot_height + COMPARISON_LABEL_HEIGHT + COMPARISON_GAP)
+                width, height = (side * COMPARISON_SCALE for side in self.page_sizes[theme_name])
+                
+                form_name = self.page_forms.get((theme_name, page_index))
+                if form_name:
+                    self.saveState()
+                    self.translate(x, y + slot_height - height)
+                    self.scale(COMPARISON_SCALE, COMPARISON_SCALE)
+                    self.doForm(form_name)
+                    self.restoreState()
+                
+                self.saveState()
+                self.setStrokeColorRGB(0.75, 0.75, 0.75)
+                self.setLineWidth(0.5)
+                self.rect(x, y + slot_height - height, width, height)
+                self.setFont('Helvetica-Bold', 10)
+                self.setFillColorRGB(0.2, 0.2, 0.2)
+                label = get_theme(theme_name).name
+                if not form_name:
+                    label += f' (no page {page_index + 1})'
+                self.drawString(x, y + slot_height + 0.1 * inch, label)
+                self.restoreState()
+            self.showPage()
+        return sheets
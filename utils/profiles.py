@@ -0,0 +1,57 @@
+"""
+Output Profiles Module
+Named trade-offs between PDF size, render speed and print fidelity
+"""
+
+from utils.images import DEFAULT_DPI, JPEG_QUALITY
+
+
+class OutputProfile:
+    """
+    How a PDF is written and how its images are re-encoded
+
+    compress: deflate page content streams (smaller files, slower writes)
+    image_dpi: resolution images are resampled to unless image_dpi is given
+    jpeg_quality: quality of re-encoded JPEGs
+    photos_as_jpeg: re-encode photographic PNGs (no transparency) as JPEG
+    grayscale: convert images to grayscale
+    originals: embed images at full resolution, only fixing their orientation
+    """
+
+    __slots__ = ('name', 'compress', 'image_dpi', 'jpeg_quality', 'photos_as_jpeg', 'grayscale', 'originals')
+
+    def __init__(self, name, compress=True, image_dpi=DEFAULT_DPI, jpeg_quality=JPEG_QUALITY,
+                 photos_as_jpeg=False, grayscale=False, originals=False):
+        self.name = name
+        self.compress = compress
+        self.image_dpi = image_dpi
+        self.jpeg_quality = jpeg_quality
+        self.photos_as_jpeg = photos_as_jpeg
+        self.grayscale = grayscale
+        self.originals = originals
+
+    def image_options(self):
+        """Keyword arguments for utils.images.prepare_image"""
+        return {'quality': self.jpeg_quality, 'photos_as_jpeg': self.photos_as_jpeg,
+                'grayscale': self.grayscale, 'originals': self.originals}
+
+
+PROFILES = {
+    # Fastest to produce: no stream compression, small low-quality images
+    'draft': OutputProfile('draft', compress=False, image_dpi=72, jpeg_quality=50, photos_as_jpeg=True),
+    # Small downloads for reading on screen
+    'web': OutputProfile('web', image_dpi=150, jpeg_quality=75, photos_as_jpeg=True),
+    # What every PDF used before profiles existed
+    'standard': OutputProfile('standard'),
+    # Full-resolution originals for printing and archiving
+    'print': OutputProfile('print', image_dpi=300, jpeg_quality=95, originals=True),
+    # Standard output with grayscale images, for black and white printers
+    'grayscale': OutputProfile('grayscale', grayscale=True)
+}
+
+DEFAULT_PROFILE = 'standard'
+
+
+def get_profile(name):
+    """Return the named profile (the default one if unknown)"""
+    return PROFILES.get(name) or PROFILES[DEFAULT_PROFILE]
@@ -0,0 +1,195 @@
+"""
+Render Cache Module
+Content-addressed cache of generated PDFs with a size budget and LRU eviction
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Size of the chunks used when hashing uploaded files
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Cached PDFs are named velvetdocs_<theme>_<key>.pdf
+FILENAME_PREFIX = 'velvetdocs_'
+KEY_LENGTH = 32
+
+
+def render_key(text_content, theme, alignment, image_paths=(), options=()):
+    """
+    Build the cache key for a render request
+
+    The key is a SHA-256 digest over the text, theme, alignment and the
+    bytes of every image (in upload order, since [IMG:n] refers to it).
+    text_content may also be a binary file object, which is hashed in
+    chunks and rewound so it can be parsed afterwards. options holds any
+    other render settings (as strings) that change the output.
+    """
+    digest = hashlib.sha256()
+    digest.update(_content_digest(text_content))
+    for part in (theme, alignment, *options):
+        data = part.encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+
+    for path in image_paths:
+        with open(path, 'rb') as f:
+            digest.update(_content_digest(f))
+
+    return digest.hexdigest()[:KEY_LENGTH]
+
+
+def _content_digest(content):
+    """SHA-256 of a string (as UTF-8) or of everything left in a binary file"""
+    if isinstance(content, str):
+        return hashlib.sha256(content.encode('utf-8')).digest()
+
+    content_digest = hashlib.sha256()
+    start = content.tell()
+    for chunk in iter(lambda: content.read(HASH_CHUNK_SIZE), b''):
+        content_digest.update(chunk)
+    content.seek(start)
+    return content_digest.digest()
+
+
+class RenderCache:
+    """
+    Index of rendered PDFs held in a Storage backend, keyed by render_key()
+
+    Entries are kept in least recently used order, which serves both the
+    size budget (max_bytes) and age-based expiry (expire()).
+    """
+
+    def __init__(self, storage, max_bytes):
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (filename, size, last_used), oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._load_existing()
+
+    def _load_existing(self):
+        """Index PDFs left over from a previous run, oldest first"""
+        found = []
+        for filename, size, mtime in self.storage.list():
+            key = self._key_from_filename(filename)
+            if key is not None:
+                found.append((mtime, key, filename, size))
+
+        for mtime, key, filename, size in sorted(found):
+            self._entries[key] = (filename, size, mtime)
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def _key_from_filename(filename):
+        """Return the cache key embedded in a cached PDF filename, if any"""
+        if not filename.startswith(FILENAME_PREFIX) or not filename.endswith('.pdf'):
+            return None
+        key = filename[:-4].rsplit('_', 1)[-1]
+        if len(key) != KEY_LENGTH:
+            return None
+        return key
+
+    def filename_for(self, key, theme):
+        """Filename a render with this key should be stored as"""
+        return f'{FILENAME_PREFIX}{theme}_{key}.pdf'
+
+    def get(self, key):
+        """Return the cached filename for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.storage.exists(entry[0]):
+                    self._entries[key] = (entry[0], entry[1], time.time())
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                # Removed behind our back (e.g. evicted by a memory backend)
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def touch(self, filename):
+        """Mark the entry for filename as used just now (e.g. on download)"""
+        key = self._key_from_filename(filename)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == filename:
+                self._entries[key] = (filename, entry[1], time.time())
+                self._entries.move_to_end(key)
+
+    def put(self, key, filename):
+        """Record a freshly stored file and evict down to the size budget"""
+        size = self.storage.size(filename) or 0
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (filename, size, time.time())
+            self._total_bytes += size
+            self._evict(keep=key)
+
+    def discard(self, filename):
+        """Forget a file that has been deleted outside the cache"""
+        key = self._key_from_filename(filename)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == filename:
+                self._drop(key)
+
+    def _drop(self, key):
+        filename, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        return filename
+
+    def _evict(self, keep=None):
+        """Remove least recently used PDFs until we fit in max_bytes"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self.storage.delete(self._drop(key))
+            self.evictions += 1
+
+    def expire(self, cutoff):
+        """
+        Remove PDFs not used since cutoff (a time.time() value)
+
+        Called by the retention sweeper. Returns (files removed, bytes freed).
+        """
+        removed = freed = 0
+        while True:
+            with self._lock:
+                if not self._entries:
+                    break
+                key, (filename, size, last_used) = next(iter(self._entries.items()))
+                if last_used >= cutoff:
+                    break
+                self._drop(key)
+                self.expirations += 1
+            self.storage.delete(filename)
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def stats(self):
+        """Return hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+        stats['storage'] = self.storage.stats()
+        return stats
@@ -0,0 +1,229 @@
+"""
+Retention Module
+Background sweeper that expires old files and keeps the folders under a disk budget
+"""
+
+import heapq
+import os
+import threading
+import time
+
+
+class RetentionSweeper:
+    """
+    Removes files from the watched folders once they go unused for ttl seconds
+
+    Files are kept in an in-memory index with a heap ordered by expiry time, so
+    a sweep only looks at files that are actually due instead of listing the
+    folders. Because every file gets the same ttl, expiry order is also
+    least-recently-used order, and the same heap drives eviction when the
+    folders grow past max_bytes. Files for which pinned(path) is true are
+    never removed; their clock restarts instead. Before an expired file is
+    removed its mtime is checked, so a file another process refreshed with
+    os.utime is kept until ttl seconds after that.
+
+    stores are objects with an expire(cutoff) method (such as the render
+    cache) that manage their own files; each sweep asks them to drop
+    whatever has not been used for ttl seconds.
+
+    Threads do not survive fork, so a forked child (e.g. a gunicorn worker
+    under --preload) has no sweeper until it calls start() itself.
+    """
+
+    def __init__(self, folders, ttl=3600, max_bytes=None, interval=30,
+                 rescan_interval=600, on_remove=None, pinned=None, stores=()):
+        self.folders = list(folders)
+        self.stores = list(stores)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.rescan_interval = rescan_interval
+        self.on_remove = on_remove
+        self.pinned = pinned
+        self._files = {}  # path -> (expires_at, size)
+        self._heap = []   # (expires_at, path); stale entries are skipped lazily
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_rescan = 0.0
+        self._stats = {
+            'sweeps': 0,
+            'expired_files': 0,
+            'evicted_files': 0,
+            'removed_bytes': 0,
+            'last_sweep_at': None,
+            'last_sweep_seconds': 0.0
+        }
+
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def start(self):
+        """Index the existing files and start the sweeper thread, unless this process already has one"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self.rescan()
+                self._thread = threading.Thread(target=self._run, name='retention-sweeper', daemon=True)
+                self._thread.start()
+
+    def _after_fork(self):
+        # The parent's sweeper thread did not come along, and it may have
+        # held the locks at the moment of the fork
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def rescan(self):
+        """Pick up files written outside this process (e.g. by other app workers)"""
+        self._last_rescan = time.time()
+        for folder in self.folders:
+            for root, _, filenames in os.walk(folder):
+                for filename in filenames:
+                    self._rescan_file(os.path.join(root, filename))
+
+    def _rescan_file(self, filepath):
+        with self._lock:
+            if filepath in self._files:
+                return
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return
+        self._add(filepath, stat.st_mtime + self.ttl, stat.st_size)
+
+    def track(self, filepath):
+        """Start (or restart) the retention clock for a newly written file"""
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            return
+        self._add(filepath, time.time() + self.ttl, size)
+
+    def touch(self, filepath):
+        """Mark a file as used just now so it expires ttl seconds from now"""
+        with self._lock:
+            entry = self._files.get(filepath)
+        if entry is None:
+            self.track(filepath)
+        else:
+            self._add(filepath, time.time() + self.ttl, entry[1])
+
+    def forget(self, filepath):
+        """Stop tracking a file that was removed by someone else"""
+        with self._lock:
+            entry = self._files.pop(filepath, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def _add(self, filepath, expires_at, size):
+        with self._lock:
+            old = self._files.get(filepath)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._files[filepath] = (expires_at, size)
+            self._total_bytes += size
+            heapq.heappush(self._heap, (expires_at, filepath))
+
+    def _pop_due(self, now):
+        """Pop the next expired (or, over budget, least recently used) file"""
+        with self._lock:
+            while self._heap:
+                expires_at, filepath = self._heap[0]
+                entry = self._files.get(filepath)
+                if entry is None or entry[0] != expires_at:
+                    heapq.heappop(self._heap)  # superseded by a later touch
+                    continue
+                over_budget = self.max_bytes is not None and self._total_bytes > self.max_bytes
+                if expires_at > now and not over_budget:
+                    return None
+                heapq.heappop(self._heap)
+                del self._files[filepath]
+                self._total_bytes -= entry[1]
+                kind = 'expired' if expires_at <= now else 'evicted'
+                return filepath, kind, entry[1]
+            return None
+
+    def sweep(self):
+        """Remove every file that is due; returns the number of files removed"""
+        started = time.time()
+        if self.rescan_interval and started - self._last_rescan >= self.rescan_interval:
+            self.rescan()
+
+        removed = 0
+        deferred = []
+        while True:
+            due = self._pop_due(started)
+            if due is None:
+                break
+            filepath, kind, size = due
+            if self.pinned is not None and self.pinned(filepath):
+                deferred.append((filepath, size))
+                continue
+            if kind == 'expired':
+                try:
+                    stat = os.stat(filepath)
+                except FileNotFoundError:
+                    stat = None
+                except OSError:
+                    continue
+                if stat is not None and stat.st_mtime + self.ttl > started:
+                    # Reused by another process since this one indexed it
+                    self._add(filepath, stat.st_mtime + self.ttl, stat.st_size)
+                    continue
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            removed += 1
+            with self._lock:
+                self._stats[kind + '_files'] += 1
+                self._stats['removed_bytes'] += size
+            if self.on_remove is not None:
+                self.on_remove(filepath)
+
+        # Files still in use get a fresh ttl once this sweep is done
+        for filepath, size in deferred:
+            self._add(filepath, time.time() + self.ttl, size)
+
+        for store in self.stores:
+            expired, freed = store.expire(started - self.ttl)
+            removed += expired
+            with self._lock:
+                self._stats['expired_files'] += expired
+                self._stats['removed_bytes'] += freed
+
+        with self._lock:
+            self._stats['sweeps'] += 1
+            self._stats['last_sweep_at'] = started
+            self._stats['last_sweep_seconds'] = time.time() - started
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                # Never let a bad file kill the sweeper thread
+                pass
+
+    def stats(self):
+        """Return sweep counters and the current size of the index"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tracked_files'] = len(self._files)
+            stats['tracked_bytes'] = self._total_bytes
+            stats['max_bytes'] = self.max_bytes
+            stats['ttl'] = self.ttl
+            return stats
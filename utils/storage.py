@@ -0,0 +1,282 @@
+"""
+Storage Module
+Where rendered PDFs are kept: sharded local folders, memory, or a SQLite file
+"""
+
+import abc
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Stored names are plain filenames; anything else (paths, dotfiles) is refused
+_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9._-]*$')
+
+
+def valid_name(name):
+    return bool(name) and _NAME_PATTERN.match(name) is not None
+
+
+def shard_path(root, name, depth=2, width=2):
+    """
+    Return root/ab/cd/name, where ab and cd come from a hash of name
+
+    Spreading files over hash-prefixed subdirectories keeps every directory
+    small, however many files there are in total.
+    """
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()
+    parts = [digest[i * width:(i + 1) * width] for i in range(depth)]
+    return os.path.join(root, *parts, name)
+
+
+class Storage(abc.ABC):
+    """
+    Interface shared by the storage backends
+
+    Names are flat filenames such as velvetdocs_academic_<key>.pdf. Renders
+    are written to a local file first and handed over with save(), so worker
+    processes never need to talk to the backend themselves. A backend that
+    leaves an abstract method out cannot be instantiated.
+    """
+
+    @abc.abstractmethod
+    def save(self, name, source_path):
+        """Take ownership of the finished file at source_path (it is moved or deleted)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def open(self, name):
+        """Return a binary file object for name, or None if it is not stored"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def exists(self, name):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def size(self, name):
+        """Size of name in bytes, or None if it is not stored"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, name):
+        """Remove name; returns True if it was stored"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list(self):
+        """Yield (name, size, mtime) for every stored file"""
+        raise NotImplementedError
+
+    def local_path(self, name):
+        """Filesystem path of name when the backend keeps one (lets send_file use sendfile)"""
+        return None
+
+    def stats(self):
+        return {'backend': type(self).__name__}
+
+
+class ShardedFileStorage(Storage):
+    """Files on the local filesystem under root/ab/cd/<name>"""
+
+    def __init__(self, root, depth=2):
+        self.root = root
+        self.depth = depth
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name):
+        if not valid_name(name):
+            return None
+        return shard_path(self.root, name, self.depth)
+
+    def save(self, name, source_path):
+        path = self._path(name)
+        if path is None:
+            raise ValueError(f'Invalid storage name: {name!r}')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    def open(self, name):
+        path = self._path(name)
+        try:
+            return open(path, 'rb') if path else None
+        except FileNotFoundError:
+            return None
+
+    def exists(self, name):
+        path = self._path(name)
+        return path is not None and os.path.isfile(path)
+
+    def size(self, name):
+        path = self._path(name)
+        try:
+            return os.path.getsize(path) if path else None
+        except OSError:
+            return None
+
+    def delete(self, name):
+        path = self._path(name)
+        if path is None:
+            return False
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def list(self):
+        for folder, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not valid_name(filename):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(folder, filename))
+                except OSError:
+                    continue
+                yield filename, stat.st_size, stat.st_mtime
+
+    def local_path(self, name):
+        path = self._path(name)
+        return os.path.abspath(path) if path and os.path.isfile(path) else None
+
+    def stats(self):
+        return {'backend': 'local', 'root': self.root}
+
+
+class MemoryStorage(Storage):
+    """
+    Files held in process memory, least recently used dropped past max_bytes
+
+    Contents are lost on restart and not shared between app processes; meant
+    for single-process deployments and tests.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()  # name -> (data, mtime), oldest first
+        self._total_bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def save(self, name, source_path):
+        with open(source_path, 'rb') as f:
+            data = f.read()
+        os.remove(source_path)
+        with self._lock:
+            old = self._files.pop(name, None)
+            if old is not None:
+                self._total_bytes -= len(old[0])
+            self._files[name] = (data, time.time())
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._files) > 1:
+                _, (evicted, _) = self._files.popitem(last=False)
+                self._total_bytes -= len(evicted)
+                self.evictions += 1
+
+    def open(self, name):
+        with self._lock:
+            entry = self._files.get(name)
+            if entry is None:
+                return None
+            self._files.move_to_end(name)
+        return io.BytesIO(entry[0])
+
+    def exists(self, name):
+        with self._lock:
+            return name in self._files
+
+    def size(self, name):
+        with self._lock:
+            entry = self._files.get(name)
+            return len(entry[0]) if entry else None
+
+    def delete(self, name):
+        with self._lock:
+            entry = self._files.pop(name, None)
+            if entry is None:
+                return False
+            self._total_bytes -= len(entry[0])
+            return True
+
+    def list(self):
+        with self._lock:
+            items = [(name, len(data), mtime) for name, (data, mtime) in self._files.items()]
+        return iter(items)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'files': len(self._files), 'bytes': self._total_bytes,
+                    'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class SQLiteStorage(Storage):
+    """
+    Files stored as blobs in a single SQLite database
+
+    One file is easy to move or back up, and is shared by every app process
+    on the host. Each thread gets its own connection; WAL mode lets readers
+    continue while a render is being saved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS files '
+                         '(name TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, mtime REAL NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def save(self, name, source_path):
+        with open(source_path, 'rb') as f:
+            data = f.read()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO files (name, data, size, mtime) VALUES (?, ?, ?, ?)',
+                         (name, sqlite3.Binary(data), len(data), time.time()))
+        os.remove(source_path)
+
+    def open(self, name):
+        row = self._connect().execute('SELECT data FROM files WHERE name = ?', (name,)).fetchone()
+        return io.BytesIO(row[0]) if row else None
+
+    def exists(self, name):
+        return self._connect().execute('SELECT 1 FROM files WHERE name = ?', (name,)).fetchone() is not None
+
+    def size(self, name):
+        row = self._connect().execute('SELECT size FROM files WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, name):
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM files WHERE name = ?', (name,)).rowcount > 0
+
+    def list(self):
+        return iter(self._connect().execute('SELECT name, size, mtime FROM files').fetchall())
+
+    def stats(self):
+        files, total = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+        return {'backend': 'sqlite', 'path': self.path, 'files': files, 'bytes': total}
+
+
+def create_storage(backend, location, max_bytes=None):
+    """Build the backend named in the app config ('local', 'memory' or 'sqlite')"""
+    if backend == 'local':
+        return ShardedFileStorage(location)
+    if backend == 'memory':
+        return MemoryStorage(max_bytes) if max_bytes else MemoryStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage(location)
+    raise ValueError(f'Unknown storage backend: {backend!r}')
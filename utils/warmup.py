@@ -0,0 +1,105 @@
+"""
+Warm-up Module
+Loads the render stack at startup so the first real request is not the slow one
+"""
+
+import gc
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image as PILImage
+
+from utils import fonts
+from utils.metrics import metrics
+from utils.parser import parse_text
+from utils.pdf_generator import THEME_CLASSES, generate_pdf, precompile_stylesheets
+
+# Touches every block type, inline formatting and an image, so each code path
+# a real render takes has run (and imported what it needs) at least once
+WARMUP_TEXT = '\n'.join([
+    '# Warm-up',
+    '## Section',
+    '### Subsection',
+    'A paragraph with **bold**, *italic* and ***both*** & <escaped> text.',
+    '',
+    '- First item',
+    '* Second item',
+    '',
+    '> A quoted line.',
+    '',
+    '[IMG:0:center]'
+])
+
+# Set once this process has been warmed, so forked workers skip it
+_warmed = False
+
+
+def warm_up(themes=None):
+    """
+    Preload fonts, stylesheets and image codecs, then render each theme once
+
+    themes defaults to every theme; pass an empty list to skip the throwaway
+    renders. Renders go to memory and are not recorded in metrics. Returns
+    the seconds spent on each step, plus 'total'.
+    """
+    global _warmed
+    report = {}
+    started = step = time.perf_counter()
+
+    def mark(name):
+        nonlocal step
+        now = time.perf_counter()
+        report[name] = now - step
+        step = now
+
+    PILImage.init()
+    mark('codecs')
+    fonts.preload_fonts()
+    mark('fonts')
+    precompile_stylesheets()
+    mark('stylesheets')
+
+    themes = THEME_CLASSES if themes is None else themes
+    if themes:
+        was_enabled, metrics.enabled = metrics.enabled, False
+        try:
+            with tempfile.TemporaryDirectory() as folder:
+                image_path = os.path.join(folder, 'warmup.jpg')
+                PILImage.new('RGB', (32, 24), 'white').save(image_path, 'JPEG')
+                for theme_name in themes:
+                    generate_pdf(parse_text(WARMUP_TEXT, [image_path]), theme_name, io.BytesIO())
+                    mark(f'render_{theme_name}')
+        finally:
+            metrics.enabled = was_enabled
+
+    report['total'] = time.perf_counter() - started
+    _warmed = True
+    return report
+
+
+def freeze_heap():
+    """
+    Move everything allocated so far out of the garbage collector's reach
+
+    Called once startup is complete. Forked processes (pre-forked server
+    workers, render workers) then share those pages copy-on-write instead
+    of each cycle collection touching, and so copying, all of them.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def warm_worker(font_folder=None):
+    """
+    Initializer for render worker processes
+
+    Workers forked from a warmed app inherit its state and return at once;
+    workers started with spawn or forkserver warm themselves up here.
+    """
+    if _warmed:
+        return
+    if font_folder is not None:
+        fonts.FONT_FOLDER = font_folder
+    warm_up()
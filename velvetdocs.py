@@ -0,0 +1,209 @@
+"""
+VelvetDocs - Command Line Renderer
+Renders text/markdown files to themed PDFs without going through the web app
+
+Usage:
+    python velvetdocs.py notes/ "reports/**/*.md" -o pdfs/ -t corporate_blue -j 8
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import images as image_prep
+from utils.jobs import render_document
+from utils.pdf_generator import ALIGNMENT_MAP, THEME_CLASSES
+
+# Extensions picked up when an input is a directory
+TEXT_EXTENSIONS = ('.txt', '.md', '.markdown')
+
+# Remembers what each output was rendered from, for incremental runs
+MANIFEST_NAME = '.velvetdocs-manifest.json'
+
+
+def find_inputs(patterns):
+    """
+    Expand files, directories and glob patterns into (path, relative name) pairs
+
+    Names are relative to the directory, or to the part of a glob pattern
+    before its first wildcard, so reports/**/*.md keeps the subdirectories.
+    """
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, filenames in os.walk(pattern):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(TEXT_EXTENSIONS):
+                        path = os.path.join(root, filename)
+                        found.setdefault(os.path.abspath(path), os.path.relpath(path, pattern))
+        elif os.path.isfile(pattern):
+            found.setdefault(os.path.abspath(pattern), os.path.basename(pattern))
+        else:
+            root = glob_root(pattern)
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    found.setdefault(os.path.abspath(path), os.path.relpath(path, root))
+    return sorted(found.items())
+
+
+def glob_root(pattern):
+    """The directory a glob pattern starts from: its leading components without wildcards"""
+    parts = []
+    for part in pattern.replace(os.sep, '/').split('/')[:-1]:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return '/'.join(parts) or '.'
+
+
+def output_paths(inputs, output_dir):
+    """
+    Map each (path, relative name) input to its PDF under output_dir
+
+    Raises ValueError when two inputs would write the same PDF, such as
+    notes.txt and notes.md in one directory.
+    """
+    outputs = {}
+    claimed = {}
+    for input_path, relative in inputs:
+        output_path = os.path.abspath(os.path.join(output_dir, os.path.splitext(relative)[0] + '.pdf'))
+        if output_path in claimed:
+            raise ValueError(f'{claimed[output_path]} and {input_path} would both be written to {output_path}')
+        claimed[output_path] = input_path
+        outputs[input_path] = output_path
+    return outputs
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def is_up_to_date(input_path, output_path, options, record):
+    """
+    Decide whether output_path can be kept
+
+    An output newer than its input (with the same options) is kept without
+    reading the input. Otherwise the input is hashed, so touching a file
+    without changing it does not force a re-render.
+    """
+    if not os.path.exists(output_path) or record is None or record.get('options') != options:
+        return False, None
+    if os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+        return True, record.get('hash')
+    digest = file_digest(input_path)
+    if digest == record.get('hash'):
+        os.utime(output_path)
+        return True, digest
+    return False, digest
+
+
+def _init_worker(prepared_image_folder):
+    image_prep.PREPARED_IMAGE_FOLDER = prepared_image_folder
+
+
+def _render(input_path, image_paths, theme, output_path, alignment, image_dpi):
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    started = time.perf_counter()
+    render_document(None, image_paths, theme, output_path, alignment, input_path, image_dpi)
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render text/markdown files to themed PDFs')
+    parser.add_argument('inputs', nargs='+', help='files, directories or glob patterns')
+    parser.add_argument('-o', '--output', default='.', help='output directory (default: current)')
+    parser.add_argument('-t', '--theme', default='academic', choices=sorted(THEME_CLASSES))
+    parser.add_argument('-a', '--alignment', default='left', choices=sorted(ALIGNMENT_MAP))
+    parser.add_argument('--image-dpi', type=int, default=image_prep.DEFAULT_DPI)
+    parser.add_argument('--images', nargs='*', default=[], help='images referenced as [IMG:0], [IMG:1], ...')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('-f', '--force', action='store_true', help='render even if outputs are up to date')
+    args = parser.parse_args(argv)
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        parser.error('no input files found')
+    try:
+        outputs = output_paths(inputs, args.output)
+    except ValueError as e:
+        parser.error(str(e))
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = load_manifest(args.output)
+    image_paths = [os.path.abspath(path) for path in args.images]
+    image_hashes = [file_digest(path) for path in image_paths]
+    options = {'theme': args.theme, 'alignment': args.alignment,
+               'image_dpi': args.image_dpi, 'images': image_hashes}
+
+    started = time.perf_counter()
+    rendered = skipped = failed = 0
+    input_bytes = output_bytes = 0
+    todo = []
+
+    for input_path, output_path in outputs.items():
+        record = manifest.get(input_path)
+        fresh, digest = (False, None) if args.force else is_up_to_date(input_path, output_path, options, record)
+        if fresh:
+            skipped += 1
+            continue
+        todo.append((input_path, output_path, digest or file_digest(input_path)))
+
+    prepared_folder = os.path.join(os.path.abspath(args.output), '.velvetdocs-images')
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), initializer=_init_worker,
+                             initargs=(prepared_folder,)) as executor:
+        futures = {
+            executor.submit(_render, input_path, image_paths, args.theme, output_path,
+                            args.alignment, args.image_dpi): (input_path, output_path, digest)
+            for input_path, output_path, digest in todo
+        }
+        for future in as_completed(futures):
+            input_path, output_path, digest = futures[future]
+            try:
+                seconds = future.result()
+            except Exception as e:
+                failed += 1
+                print(f'FAILED {input_path}: {e}', file=sys.stderr)
+                continue
+            rendered += 1
+            input_bytes += os.path.getsize(input_path)
+            output_bytes += os.path.getsize(output_path)
+            manifest[input_path] = {'hash': digest, 'options': options, 'output': output_path}
+            print(f'{seconds:7.2f}s  {output_path}')
+
+    save_manifest(args.output, manifest)
+
+    elapsed = time.perf_counter() - started
+    print(f'\n{rendered} rendered, {skipped} up to date, {failed} failed '
+          f'in {elapsed:.2f}s with {args.jobs} workers')
+    if rendered:
+        print(f'{rendered / elapsed:.1f} docs/s, {input_bytes / elapsed / 1e6:.2f} MB/s of input, '
+              f'{output_bytes / 1e6:.2f} MB of PDF written')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())